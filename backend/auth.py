@@ -1,13 +1,16 @@
 
 import os
+from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from typing import Optional, Tuple
 from jose import JWTError, jwt
-from passlib.context import CryptContext
+from fastapi.concurrency import run_in_threadpool
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
 from . import database as db
+from . import cache
+from . import passwords
 
 # ==============================================================================
 # CONFIGURATION DE LA SÉCURITÉ
@@ -18,19 +21,45 @@ SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-# Contexte pour le hachage des mots de passe
-pwd_context = CryptContext(schemes=["argon2", "bcrypt"], deprecated="auto")
-
 # Schéma OAuth2 pour que FastAPI sache comment trouver le token
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/token")
 
+# ==============================================================================
+# UTILISATEUR AUTHENTIFIÉ
+# ==============================================================================
+
+@dataclass(frozen=True)
+class RolePrincipal:
+    id: int
+    name: str
+
+@dataclass(frozen=True)
+class Principal:
+    """
+    Instantané immuable d'un utilisateur authentifié, détaché de toute session.
+    Il est mis en cache par nom d'utilisateur pour éviter une requête à chaque appel.
+    """
+    id: int
+    username: str
+    email: str
+    roles: Tuple[RolePrincipal, ...]
+
+    @classmethod
+    def from_user(cls, user):
+        return cls(
+            id=user.id,
+            username=user.username,
+            email=user.email,
+            roles=tuple(RolePrincipal(id=role.id, name=role.name) for role in user.roles)
+        )
+
 # ==============================================================================
 # FONCTIONS DE VÉRIFICATION ET DE CRÉATION
 # ==============================================================================
 
 def verify_password(plain_password, hashed_password):
     """Vérifie si un mot de passe en clair correspond au mot de passe haché."""
-    return pwd_context.verify(plain_password, hashed_password)
+    return passwords.verify_password(plain_password, hashed_password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Crée un nouveau token d'accès JWT."""
@@ -47,13 +76,14 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
 # LOGIQUE D'AUTHENTIFICATION PRINCIPALE
 # ==============================================================================
 
-def authenticate_user(db_session: Session, username: str, password: str):
+async def authenticate_user(db_session: Session, username: str, password: str):
     """
     Authentifie un utilisateur. Retourne l'objet User si l'authentification réussit,
-    sinon None.
+    sinon None. La lecture en base passe par le pool de threads et la vérification
+    Argon2 par le pool de hachage borné : la boucle d'événements n'est jamais bloquée.
     """
-    user = db.get_user_by_username(db_session, username=username)
-    if not user or not verify_password(password, user.hashed_password):
+    user = await run_in_threadpool(db.get_user_by_username, db_session, username=username)
+    if not user or not await passwords.verify_password_async(password, user.hashed_password):
         return None
     return user
 
@@ -75,7 +105,11 @@ def get_current_user(token: str = Depends(oauth2_scheme), db_session: Session =
     except JWTError:
         raise credentials_exception
     
-    user = db.get_user_by_username(db_session, username=username)
-    if user is None:
+    principal = cache.principals.get_or_set(username, lambda: load_principal(db_session, username))
+    if principal is None:
         raise credentials_exception
-    return user
+    return principal
+
+def load_principal(db_session: Session, username: str):
+    user = db.get_user_by_username(db_session, username=username)
+    return Principal.from_user(user) if user else None
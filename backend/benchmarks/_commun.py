@@ -0,0 +1,142 @@
+"""
+Outils partagés par les scripts de benchmark.
+
+Les benchmarks travaillent sur une base SQLite temporaire : la base de
+production n'est jamais touchée.
+"""
+import os
+import random
+import socket
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from sqlalchemy import insert
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+
+ADMIN_USERNAME = "bench_admin"
+ADMIN_PASSWORD = "bench_password"
+
+
+def utiliser_base(url: str):
+    """Redirige le module `database` vers la base `url`. Retourne le module `database`."""
+    os.environ.setdefault("SECRET_KEY", "cle-de-benchmark")
+    # En-têtes X-DB-Queries / X-DB-Time-Ms, désactivés par défaut en production.
+    os.environ.setdefault("METRICS_DEBUG_HEADERS", "1")
+    # main.py monte le build du frontend au démarrage : il doit exister.
+    os.makedirs(PROJECT_ROOT / "frontend" / "build" / "static", exist_ok=True)
+
+    from .. import database as db
+
+    db.engine = db.creer_engine(url)
+    db.SessionLocal.configure(bind=db.engine)
+    return db
+
+
+def preparer_base(nom: str = "bench.db", url: str = None):
+    """
+    Redirige le module `database` vers une base vide (`url`, ou une base SQLite
+    temporaire), crée les tables et un administrateur. Retourne le module `database`.
+    """
+    db = utiliser_base(url or f"sqlite:///{Path(tempfile.mkdtemp()) / nom}")
+    db.Base.metadata.create_all(bind=db.engine)
+
+    with db.get_db() as session:
+        session.add_all([db.Role(name="admin"), db.Role(name="manager")])
+        session.commit()
+        db.create_user(session, {
+            "username": ADMIN_USERNAME,
+            "email": "bench@example.com",
+            "password": ADMIN_PASSWORD,
+            "roles": ["admin", "manager"],
+        })
+    return db
+
+
+def inserer_donnees(db, n_produits: int, n_ventes: int, jours: int = 365, graine: int = 42):
+    """Insère des produits et des ventes aléatoires réparties sur `jours` jours."""
+    rng = random.Random(graine)
+    maintenant = datetime.now(timezone.utc)
+    with db.engine.begin() as conn:
+        conn.execute(insert(db.Produit), [
+            {"nom": f"Produit {i}", "prix_achat": 100 + i % 50, "prix_vente": 150 + i % 70, "quantite": 1000}
+            for i in range(1, n_produits + 1)
+        ])
+        lot = []
+        for _ in range(n_ventes):
+            quantite = rng.randint(1, 5)
+            lot.append({
+                "produit_id": rng.randint(1, n_produits),
+                "quantite": quantite,
+                "prix_total": 200.0 * quantite,
+                "date": maintenant - timedelta(seconds=rng.randint(0, jours * 86400)),
+                "user_id": 1,
+            })
+            if len(lot) == 50_000:
+                conn.execute(insert(db.Vente), lot)
+                lot = []
+        if lot:
+            conn.execute(insert(db.Vente), lot)
+    # Les ventes sont insérées directement : l'agrégat journalier est reconstruit.
+    with db.get_db() as session:
+        db.rebuild_daily_stats(session)
+
+
+def entetes_admin():
+    """En-têtes d'authentification pour l'administrateur de benchmark."""
+    from .. import auth
+    token = auth.create_access_token(data={"sub": ADMIN_USERNAME}, expires_delta=timedelta(hours=1))
+    return {"Authorization": f"Bearer {token}"}
+
+
+def port_libre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def demarrer_serveur(port: int):
+    """Démarre l'application sous uvicorn dans un thread (avec sa propre boucle d'événements)."""
+    import uvicorn
+    from .. import main
+
+    serveur = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=serveur.run, daemon=True)
+    thread.start()
+    while not serveur.started:
+        time.sleep(0.05)
+    return serveur, thread
+
+
+def percentile(valeurs, p: float) -> float:
+    """Percentile `p` (0-100) par la méthode du rang le plus proche."""
+    if not valeurs:
+        return 0.0
+    triees = sorted(valeurs)
+    rang = max(0, min(len(triees) - 1, round(p / 100 * len(triees) + 0.5) - 1))
+    return triees[rang]
+
+
+def resume_latences(latences):
+    """Résumé (en millisecondes) d'une liste de latences exprimées en secondes."""
+    return {
+        "n": len(latences),
+        "p50_ms": round(percentile(latences, 50) * 1000, 2),
+        "p95_ms": round(percentile(latences, 95) * 1000, 2),
+        "p99_ms": round(percentile(latences, 99) * 1000, 2),
+        "max_ms": round(max(latences, default=0) * 1000, 2),
+    }
+
+
+class Chrono:
+    """Gestionnaire de contexte mesurant une durée en secondes."""
+
+    def __enter__(self):
+        self.debut = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.duree = time.perf_counter() - self.debut
@@ -0,0 +1,52 @@
+"""
+Micro-benchmark du coût d'authentification par requête.
+
+Usage (depuis la racine du projet) :
+    python -m backend.benchmarks.bench_auth --appels 5000
+
+Mesure `auth.get_current_user` (décodage du JWT + résolution de l'utilisateur)
+sans cache de principals, puis avec, ainsi que la latence d'un GET
+/api/users/me complet dans les deux cas.
+"""
+import argparse
+import json
+import time
+
+from . import _commun
+
+
+def par_appel_us(fonction, appels):
+    debut = time.perf_counter()
+    for _ in range(appels):
+        fonction()
+    return round((time.perf_counter() - debut) / appels * 1e6, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--appels", type=int, default=5000)
+    args = parser.parse_args()
+
+    db = _commun.preparer_base()
+    from .. import auth, cache, main as app_main
+    from fastapi.testclient import TestClient
+
+    entetes = _commun.entetes_admin()
+    token = entetes["Authorization"].split()[1]
+    client = TestClient(app_main.app)
+    resultats = {}
+
+    with db.get_db() as session:
+        for mode, maxsize in (("sans_cache", 0), ("avec_cache", cache.PRINCIPAL_CACHE_MAXSIZE)):
+            cache.principals.maxsize = maxsize
+            cache.principals.invalider()
+            resultats[mode] = {
+                "get_current_user_us": par_appel_us(lambda: auth.get_current_user(token, session), args.appels),
+                "get_users_me_us": par_appel_us(lambda: client.get("/api/users/me", headers=entetes), args.appels // 10),
+            }
+    resultats["principals"] = cache.principals.stats()
+    print(json.dumps(resultats, indent=2))
+
+
+if __name__ == "__main__":
+    main()
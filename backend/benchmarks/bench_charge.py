@@ -0,0 +1,210 @@
+"""
+Test de charge reproductible des principaux parcours de l'API.
+
+Usage (depuis la racine du projet) :
+    python -m backend.benchmarks.bench_charge --concurrence 20 --duree 10 --sortie resultats.json
+    python -m backend.benchmarks.bench_charge --sortie apres.json --reference avant.json
+
+Par défaut, génère une base temporaire (voir generateur.py, --produits et
+--ventes) et démarre l'application sous uvicorn dans ce processus. Avec
+--url-base, l'application tourne sur une base déjà générée ; avec --serveur,
+les requêtes visent un serveur déjà lancé (dont la base a été générée par
+generateur.py, pour l'administrateur de benchmark).
+
+Chaque scénario tourne `--duree` secondes avec `--concurrence` clients qui
+enchaînent les requêtes sans pause. Le résultat (débit, erreurs, percentiles
+de latence, commit git) est écrit en JSON. Avec --reference, chaque scénario
+est comparé à un résultat précédent : code de sortie 1 si le débit baisse ou
+si le p95 augmente de plus de --seuil %.
+"""
+import argparse
+import asyncio
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import date, datetime, timedelta, timezone
+
+import httpx
+
+from . import _commun
+from . import generateur
+
+
+async def login(client, contexte):
+    return await client.post("/api/token", data={"username": _commun.ADMIN_USERNAME, "password": _commun.ADMIN_PASSWORD})
+
+
+async def checkout(client, contexte):
+    produit_id = contexte["rng"].choice(contexte["produits_en_stock"])
+    return await client.post("/api/ventes", json={"produit_id": produit_id, "quantite": 1}, headers=contexte["entetes"])
+
+
+async def dashboard(client, contexte):
+    return await client.get("/api/dashboard", headers=contexte["entetes"])
+
+
+async def analyse(client, contexte):
+    # Fenêtre de 30 jours au hasard sur les deux dernières années.
+    fin = date.today() - timedelta(days=contexte["rng"].randint(0, 700))
+    params = {"start_date": (fin - timedelta(days=29)).isoformat(), "end_date": fin.isoformat()}
+    return await client.get("/api/analyse", params=params, headers=contexte["entetes"])
+
+
+async def liste_ventes(client, contexte):
+    params = {"limit": 50}
+    if contexte["rng"].random() < 0.5:
+        params["produit_id"] = contexte["rng"].choice(contexte["produits_en_stock"])
+    return await client.get("/api/ventes", params=params, headers=contexte["entetes"])
+
+
+async def catalogue(client, contexte):
+    return await client.get("/api/produits", headers=contexte["entetes"])
+
+
+SCENARIOS = {
+    "login": login,
+    "checkout": checkout,
+    "dashboard": dashboard,
+    "analyse": analyse,
+    "liste_ventes": liste_ventes,
+    "catalogue": catalogue,
+}
+
+
+async def executer_scenario(client, scenario, contexte, concurrence: int, duree: float):
+    latences, erreurs, statuts = [], 0, {}
+    fin = time.perf_counter() + duree
+
+    async def client_virtuel():
+        nonlocal erreurs
+        while time.perf_counter() < fin:
+            debut = time.perf_counter()
+            try:
+                response = await scenario(client, contexte)
+                statut = response.status_code
+            except httpx.HTTPError as e:
+                statut = type(e).__name__
+            latences.append(time.perf_counter() - debut)
+            statuts[str(statut)] = statuts.get(str(statut), 0) + 1
+            if not isinstance(statut, int) or statut >= 400:
+                erreurs += 1
+
+    with _commun.Chrono() as chrono:
+        await asyncio.gather(*(client_virtuel() for _ in range(concurrence)))
+    return {
+        "erreurs": erreurs,
+        "statuts": statuts,
+        "debit_rps": round(len(latences) / chrono.duree, 1),
+        **_commun.resume_latences(latences),
+    }
+
+
+def commit_git():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=_commun.PROJECT_ROOT,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def comparer(resultats: dict, reference: dict, seuil: float):
+    """Écarts (en %) du débit et du p95 par rapport à `reference` ; liste des régressions."""
+    ecarts, regressions = {}, []
+    for nom, actuel in resultats["scenarios"].items():
+        ancien = reference.get("scenarios", {}).get(nom)
+        if not ancien or not ancien["debit_rps"] or not ancien["p95_ms"]:
+            continue
+        debit = round((actuel["debit_rps"] / ancien["debit_rps"] - 1) * 100, 1)
+        p95 = round((actuel["p95_ms"] / ancien["p95_ms"] - 1) * 100, 1)
+        ecarts[nom] = {"debit_pct": debit, "p95_pct": p95}
+        if debit < -seuil or p95 > seuil:
+            regressions.append(nom)
+    return ecarts, regressions
+
+
+async def executer(args):
+    serveur = None
+    if args.serveur:
+        base_url = args.serveur
+    else:
+        if args.url_base:
+            db = _commun.utiliser_base(args.url_base)
+        else:
+            db = _commun.preparer_base()
+            generateur.generer(db, args.produits, args.ventes, graine=args.graine)
+        port = _commun.port_libre()
+        serveur, thread = _commun.demarrer_serveur(port)
+        base_url = f"http://127.0.0.1:{port}"
+
+    limites = httpx.Limits(max_connections=args.concurrence + 10)
+    async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=limites) as client:
+        token = (await login(client, {})).raise_for_status().json()["access_token"]
+        entetes = {"Authorization": f"Bearer {token}"}
+        produits = (await client.get("/api/produits", headers=entetes)).raise_for_status().json()
+        contexte = {
+            "rng": random.Random(args.graine),
+            "entetes": entetes,
+            # Une vente ne doit pas échouer faute de stock pendant le test.
+            "produits_en_stock": [p["id"] for p in produits if p["quantite"] >= 1000] or [p["id"] for p in produits],
+        }
+        scenarios = {}
+        for nom in args.scenarios:
+            scenarios[nom] = await executer_scenario(client, SCENARIOS[nom], contexte, args.concurrence, args.duree)
+            print(f"{nom} : {scenarios[nom]['debit_rps']} req/s, p95 {scenarios[nom]['p95_ms']} ms", file=sys.stderr)
+
+    if serveur is not None:
+        serveur.should_exit = True
+        thread.join()
+    return {
+        "meta": {
+            "commit": commit_git(),
+            "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "serveur": args.serveur or "uvicorn local",
+            "base": None if args.serveur else (args.url_base or f"générée : {args.produits} produits, {args.ventes} ventes"),
+            "concurrence": args.concurrence,
+            "duree_s": args.duree,
+            "graine": args.graine,
+        },
+        "scenarios": scenarios,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--serveur", help="URL d'un serveur déjà lancé, ex. http://127.0.0.1:8000")
+    parser.add_argument("--url-base", help="base déjà générée par generateur.py, ex. sqlite:///magasin_bench.db")
+    parser.add_argument("--produits", type=int, default=2000)
+    parser.add_argument("--ventes", type=int, default=200_000)
+    parser.add_argument("--concurrence", type=int, default=20)
+    parser.add_argument("--duree", type=float, default=10, help="durée de chaque scénario, en secondes")
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--graine", type=int, default=42)
+    parser.add_argument("--sortie", help="fichier JSON du résultat (sinon sortie standard)")
+    parser.add_argument("--reference", help="résultat JSON précédent à comparer")
+    parser.add_argument("--seuil", type=float, default=10, help="écart toléré en %% avant de signaler une régression")
+    args = parser.parse_args()
+
+    resultats = asyncio.run(executer(args))
+    code_sortie = 0
+    if args.reference:
+        with open(args.reference) as f:
+            ecarts, regressions = comparer(resultats, json.load(f), args.seuil)
+        resultats["comparaison"] = {"reference": args.reference, "ecarts": ecarts, "regressions": regressions}
+        code_sortie = 1 if regressions else 0
+
+    texte = json.dumps(resultats, indent=2, ensure_ascii=False)
+    if args.sortie:
+        with open(args.sortie, "w") as f:
+            f.write(texte + "\n")
+    print(texte)
+    sys.exit(code_sortie)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Benchmark de concurrence : latence de /api/ventes pendant qu'une analyse
+financière lourde tourne sur le même worker.
+
+Usage (depuis la racine du projet) :
+    python -m backend.benchmarks.bench_concurrence --ventes 100000 --requetes 100
+
+Le script mesure la latence de /api/ventes seule, puis pendant que des appels
+à /api/analyse tournent en boucle, et affiche les percentiles p50/p95/p99.
+"""
+import argparse
+import asyncio
+import json
+import time
+from datetime import date, timedelta
+
+import httpx
+
+from . import _commun
+
+
+async def mesurer_ventes(client, entetes, n_requetes, concurrence):
+    latences = []
+    semaphore = asyncio.Semaphore(concurrence)
+
+    async def une_requete():
+        async with semaphore:
+            debut = time.perf_counter()
+            response = await client.get("/api/ventes", headers=entetes)
+            response.raise_for_status()
+            latences.append(time.perf_counter() - debut)
+
+    await asyncio.gather(*(une_requete() for _ in range(n_requetes)))
+    return latences
+
+
+async def boucle_analyse(client, entetes, arret: asyncio.Event, compteur: list):
+    # Une période différente à chaque appel : sinon, après le premier, l'analyse
+    # serait servie par le cache des résultats sans requête lourde.
+    while not arret.is_set():
+        fin = date(2100, 1, 1) - timedelta(days=len(compteur))
+        params = {"start_date": date(2000, 1, 1).isoformat(), "end_date": fin.isoformat()}
+        response = await client.get("/api/analyse", params=params, headers=entetes)
+        response.raise_for_status()
+        compteur.append(1)
+
+
+async def executer(args):
+    db = _commun.preparer_base()
+    _commun.inserer_donnees(db, n_produits=args.produits, n_ventes=args.ventes)
+
+    from .. import main
+    entetes = _commun.entetes_admin()
+    transport = httpx.ASGITransport(app=main.app)
+    resultats = {}
+    async with main.app.router.lifespan_context(main.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            latences = await mesurer_ventes(client, entetes, args.requetes, args.concurrence)
+            resultats["ventes_seules"] = _commun.resume_latences(latences)
+
+            arret = asyncio.Event()
+            analyses = []
+            taches = [asyncio.create_task(boucle_analyse(client, entetes, arret, analyses)) for _ in range(args.analyses)]
+            await asyncio.sleep(0.1)
+            latences = await mesurer_ventes(client, entetes, args.requetes, args.concurrence)
+            arret.set()
+            await asyncio.gather(*taches)
+            resultats["ventes_pendant_analyse"] = _commun.resume_latences(latences)
+            resultats["analyses_executees"] = len(analyses)
+
+    print(json.dumps(resultats, indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--produits", type=int, default=500)
+    parser.add_argument("--ventes", type=int, default=100_000, help="ventes générées pour alourdir l'analyse")
+    parser.add_argument("--requetes", type=int, default=100, help="nombre d'appels à /api/ventes par phase")
+    parser.add_argument("--concurrence", type=int, default=10)
+    parser.add_argument("--analyses", type=int, default=2, help="analyses exécutées en parallèle")
+    asyncio.run(executer(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Test de charge du flux /api/events (Server-Sent Events).
+
+Usage (depuis la racine du projet) :
+    python -m backend.benchmarks.bench_evenements --clients 500 --ventes 200
+
+Démarre l'application sous uvicorn, connecte `--clients` clients au flux, puis
+enregistre `--ventes` ventes une à une. Pour chaque vente, mesure le délai entre
+l'envoi du POST et la réception de l'événement par chaque client. Affiche les
+percentiles de ce délai, le nombre d'événements reçus et les compteurs du
+diffuseur (clients déconnectés pour lenteur).
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+
+from . import _commun
+
+
+async def client_sse(client, token, envois: dict, latences: list, connectes: asyncio.Event, compteur: list, n_clients: int):
+    async with client.stream("GET", "/api/events", params={"token": token}) as response:
+        response.raise_for_status()
+        compteur[0] += 1
+        if compteur[0] == n_clients:
+            connectes.set()
+        evenement = None
+        async for ligne in response.aiter_lines():
+            if ligne.startswith("event: "):
+                evenement = ligne[len("event: "):]
+            elif ligne.startswith("data: ") and evenement == "ventes":
+                recu = time.perf_counter()
+                quantite = json.loads(ligne[len("data: "):])["quantite"]
+                latences.append(recu - envois[quantite])
+
+
+async def executer(args):
+    db = _commun.preparer_base()
+    _commun.inserer_donnees(db, n_produits=1, n_ventes=0)
+    with db.get_db() as session:
+        session.query(db.Produit).update({"quantite": 10**9})
+        session.commit()
+    port = _commun.port_libre()
+    serveur, thread = _commun.demarrer_serveur(port)
+    from .. import evenements
+
+    token = _commun.entetes_admin()["Authorization"].split()[1]
+    limites = httpx.Limits(max_connections=args.clients + 10)
+    latences, envois = [], {}
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=None, limits=limites) as client:
+        connectes, compteur = asyncio.Event(), [0]
+        taches = [
+            asyncio.create_task(client_sse(client, token, envois, latences, connectes, compteur, args.clients))
+            for _ in range(args.clients)
+        ]
+        await asyncio.wait_for(connectes.wait(), 60)
+
+        entetes = {"Authorization": f"Bearer {token}"}
+        with _commun.Chrono() as chrono:
+            # La quantité identifie la vente dans l'événement reçu.
+            for quantite in range(1, args.ventes + 1):
+                envois[quantite] = time.perf_counter()
+                response = await client.post("/api/ventes", json={"produit_id": 1, "quantite": quantite}, headers=entetes)
+                response.raise_for_status()
+            attendus = args.clients * args.ventes
+            fin = time.perf_counter() + 30
+            while len(latences) < attendus and time.perf_counter() < fin:
+                await asyncio.sleep(0.05)
+
+        for tache in taches:
+            tache.cancel()
+        await asyncio.gather(*taches, return_exceptions=True)
+
+    stats = evenements.diffuseur.stats()
+    serveur.should_exit = True
+    thread.join()
+    print(json.dumps({
+        "clients": args.clients,
+        "ventes": args.ventes,
+        "evenements_attendus": attendus,
+        "evenements_recus": len(latences),
+        "duree_s": round(chrono.duree, 2),
+        "delai_reception": _commun.resume_latences(latences),
+        "diffuseur": stats,
+    }, indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=500)
+    parser.add_argument("--ventes", type=int, default=200)
+    asyncio.run(executer(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
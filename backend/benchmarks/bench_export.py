@@ -0,0 +1,79 @@
+"""
+Benchmark de l'export en flux : mémoire constante quel que soit le volume.
+
+Usage (depuis la racine du projet, Linux) :
+    python -m backend.benchmarks.bench_export --ventes 5000000 --format csv
+
+Génère les ventes, puis consomme le flux d'export complet en échantillonnant
+la mémoire résidente (VmRSS) du processus. Affiche le débit, la RSS avant
+l'export et la RSS maximale observée pendant l'export.
+"""
+import argparse
+import gc
+import json
+import threading
+
+from . import _commun
+
+
+def rss_mo():
+    """Mémoire résidente courante du processus, en Mo (lue dans /proc)."""
+    with open("/proc/self/status") as status:
+        for ligne in status:
+            if ligne.startswith("VmRSS:"):
+                return int(ligne.split()[1]) / 1024
+    return 0.0
+
+
+class EchantillonneurRSS(threading.Thread):
+    def __init__(self, intervalle=0.05):
+        super().__init__(daemon=True)
+        self.intervalle = intervalle
+        self.pic = rss_mo()
+        self._arret = threading.Event()
+
+    def run(self):
+        while not self._arret.wait(self.intervalle):
+            self.pic = max(self.pic, rss_mo())
+
+    def arreter(self):
+        self._arret.set()
+        self.join()
+        self.pic = max(self.pic, rss_mo())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--produits", type=int, default=1000)
+    parser.add_argument("--ventes", type=int, default=5_000_000)
+    parser.add_argument("--format", choices=["csv", "xlsx"], default="csv")
+    args = parser.parse_args()
+
+    db = _commun.preparer_base()
+    _commun.inserer_donnees(db, n_produits=args.produits, n_ventes=args.ventes)
+    from .. import export
+
+    gc.collect()
+    rss_avant = rss_mo()
+    echantillonneur = EchantillonneurRSS()
+    echantillonneur.start()
+    flux, _ = export.FORMATS[args.format]
+    octets = 0
+    with _commun.Chrono() as chrono:
+        for morceau in flux("ventes"):
+            octets += len(morceau)
+    echantillonneur.arreter()
+
+    print(json.dumps({
+        "lignes": args.ventes,
+        "format": args.format,
+        "duree_s": round(chrono.duree, 2),
+        "lignes_par_s": round(args.ventes / chrono.duree),
+        "taille_mo": round(octets / 1024 / 1024, 1),
+        "rss_avant_export_mo": round(rss_avant, 1),
+        "rss_max_pendant_export_mo": round(echantillonneur.pic, 1),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Benchmark de l'import du catalogue produits.
+
+Usage (depuis la racine du projet) :
+    python -m backend.benchmarks.bench_import --produits 100000 --taille-lot 1000
+
+Génère un catalogue CSV (ou XLSX) de `--produits` lignes et l'envoie deux fois
+sur /api/produits/import : le premier passage crée tous les produits, le
+second les met tous à jour. Affiche la durée et le débit de chaque passage.
+"""
+import argparse
+import csv
+import io
+import json
+
+from . import _commun
+
+
+def generer_catalogue(n_produits: int, format: str, variation: int = 0) -> bytes:
+    lignes = [("nom", "prix_achat", "prix_vente", "quantite")]
+    lignes += [(f"Article {i}", 100 + i % 50 + variation, 150 + i % 70 + variation, i % 500) for i in range(n_produits)]
+    if format == "csv":
+        tampon = io.StringIO()
+        csv.writer(tampon).writerows(lignes)
+        return tampon.getvalue().encode("utf-8")
+    from openpyxl import Workbook
+    classeur = Workbook(write_only=True)
+    feuille = classeur.create_sheet()
+    for ligne in lignes:
+        feuille.append(ligne)
+    tampon = io.BytesIO()
+    classeur.save(tampon)
+    return tampon.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--produits", type=int, default=100_000)
+    parser.add_argument("--taille-lot", type=int, default=1000)
+    parser.add_argument("--format", choices=["csv", "xlsx"], default="csv")
+    args = parser.parse_args()
+
+    db = _commun.preparer_base()
+    from fastapi.testclient import TestClient
+    from .. import main as application
+
+    client = TestClient(application.app)
+    entetes = _commun.entetes_admin()
+    resultats = {"produits": args.produits, "taille_lot": args.taille_lot, "format": args.format}
+    for passage, variation in (("creation", 0), ("mise_a_jour", 1)):
+        contenu = generer_catalogue(args.produits, args.format, variation)
+        with _commun.Chrono() as chrono:
+            response = client.post(
+                "/api/produits/import",
+                params={"taille_lot": args.taille_lot},
+                files={"fichier": (f"catalogue.{args.format}", contenu)},
+                headers=entetes,
+            )
+        response.raise_for_status()
+        rapport = response.json()
+        resultats[passage] = {
+            "duree_s": round(chrono.duree, 2),
+            "lignes_par_s": round(args.produits / chrono.duree),
+            "crees": rapport["crees"],
+            "mis_a_jour": rapport["mis_a_jour"],
+            "erreurs": len(rapport["erreurs"]),
+        }
+    print(json.dumps(resultats, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Benchmark des index sur (date) et (produit_id, date) des tables de faits.
+
+Usage (depuis la racine du projet) :
+    python -m backend.benchmarks.bench_index --ventes 1000000
+
+Génère les ventes, supprime les index, mesure plans et temps des requêtes
+d'analyse, puis recrée les index avec `create_db_and_tables` et mesure à
+nouveau.
+"""
+import argparse
+import json
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import text
+
+from . import _commun
+
+# Requêtes représentatives dont on compare le plan d'exécution.
+REQUETES_PLAN = {
+    "ca_periode": "SELECT sum(prix_total) FROM ventes WHERE date >= :debut AND date <= :fin",
+    "ventes_produit_periode": "SELECT sum(quantite) FROM ventes WHERE produit_id = 1 AND date >= :debut AND date <= :fin",
+    "pertes_periode": "SELECT produit_id, sum(quantite) FROM pertes WHERE date >= :debut AND date <= :fin GROUP BY produit_id",
+}
+
+
+def plans(db, debut, fin):
+    with db.engine.connect() as conn:
+        return {
+            nom: [ligne[-1] for ligne in conn.execute(text(f"EXPLAIN QUERY PLAN {sql}"), {"debut": debut, "fin": fin})]
+            for nom, sql in REQUETES_PLAN.items()
+        }
+
+
+def chronometrer(fonction, repetitions):
+    durees = []
+    for _ in range(repetitions):
+        with _commun.Chrono() as chrono:
+            fonction()
+        durees.append(chrono.duree)
+    return round(min(durees) * 1000, 2)
+
+
+def mesurer(db, repetitions):
+    fin = date.today()
+    debut = fin - timedelta(days=30)
+    debut_iso, fin_iso = f"{debut}T00:00:00", f"{fin}T23:59:59"
+    with db.get_db() as session:
+        return {
+            "plans": plans(db, datetime.fromisoformat(debut_iso), datetime.fromisoformat(fin_iso)),
+            "temps_min_ms": {
+                "analyse_30_jours": chronometrer(lambda: db.get_analyse_financiere(session, debut_iso, fin_iso), repetitions),
+                "dashboard": chronometrer(lambda: db.get_dashboard_kpis(session), repetitions),
+                "page_ventes_produit": chronometrer(lambda: db.get_ventes_page(session, 50, produit_id=1), repetitions),
+            },
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--produits", type=int, default=1000)
+    parser.add_argument("--ventes", type=int, default=1_000_000)
+    parser.add_argument("--repetitions", type=int, default=3)
+    args = parser.parse_args()
+
+    db = _commun.preparer_base()
+    _commun.inserer_donnees(db, n_produits=args.produits, n_ventes=args.ventes)
+
+    index = [index for modele in (db.Vente, db.Perte, db.FraisAnnexe) for index in modele.__table__.indexes]
+    for i in index:
+        i.drop(bind=db.engine)
+    with db.engine.connect() as conn:
+        conn.execute(text("ANALYZE"))
+    avant = mesurer(db, args.repetitions)
+
+    with _commun.Chrono() as creation:
+        db.create_db_and_tables()
+    with db.engine.connect() as conn:
+        conn.execute(text("ANALYZE"))
+    apres = mesurer(db, args.repetitions)
+
+    print(json.dumps({
+        "ventes": args.ventes,
+        "creation_index_s": round(creation.duree, 2),
+        "avant": avant,
+        "apres": apres,
+    }, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Benchmark de la sérialisation des grandes listes (page de /api/ventes).
+
+Usage (depuis la racine du projet) :
+    python -m backend.benchmarks.bench_listes --ventes 100000
+
+Compare, pour une page de `--ventes` ventes avec leur produit :
+  - ancien : objets ORM (joinedload), validation par Pydantic depuis les
+    attributs (response_model=Page[Vente]) puis encodage JSON par Pydantic,
+    comme le faisait FastAPI ;
+  - nouveau : colonnes projetées en dictionnaires par la requête, encodées par
+    orjson (main.reponse_json), sans validation.
+Affiche le meilleur temps sur `--repetitions` passes, le débit, et le pic
+d'allocations mesuré par tracemalloc sur une passe séparée.
+"""
+import argparse
+import gc
+import json
+import tracemalloc
+
+from sqlalchemy.orm import joinedload
+
+from . import _commun
+
+
+def mesurer(fonction, lignes: int, repetitions: int):
+    durees = []
+    for _ in range(repetitions):
+        gc.collect()
+        with _commun.Chrono() as chrono:
+            corps = fonction()
+        durees.append(chrono.duree)
+    gc.collect()
+    tracemalloc.start()
+    fonction()
+    _, pic = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "duree_s": round(min(durees), 3),
+        "lignes_par_s": round(lignes / min(durees)),
+        "taille_mo": round(len(corps) / 1024 / 1024, 1),
+        "pic_alloc_mo": round(pic / 1024 / 1024, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--produits", type=int, default=2000)
+    parser.add_argument("--ventes", type=int, default=100_000)
+    parser.add_argument("--repetitions", type=int, default=3)
+    args = parser.parse_args()
+
+    db = _commun.preparer_base()
+    _commun.inserer_donnees(db, n_produits=args.produits, n_ventes=args.ventes)
+    from pydantic import TypeAdapter
+    from .. import main as application
+
+    page = TypeAdapter(application.Page[application.Vente])
+
+    def ancien():
+        with db.get_db() as session:
+            ventes = (
+                session.query(db.Vente).options(joinedload(db.Vente.produit))
+                .order_by(db.Vente.date.desc(), db.Vente.id.desc()).limit(args.ventes).all()
+            )
+            return page.dump_json(page.validate_python({"items": ventes, "next_cursor": None}, from_attributes=True))
+
+    def nouveau():
+        with db.get_db() as session:
+            items, next_cursor = db.get_ventes_page(session, args.ventes)
+            return application.reponse_json({"items": items, "next_cursor": next_cursor}).body
+
+    assert json.loads(ancien()) == json.loads(nouveau()), "Les deux chemins doivent produire le même JSON."
+    resultats = {"ancien": mesurer(ancien, args.ventes, args.repetitions), "nouveau": mesurer(nouveau, args.ventes, args.repetitions)}
+    resultats["acceleration"] = round(resultats["ancien"]["duree_s"] / resultats["nouveau"]["duree_s"], 2)
+    print(json.dumps({"lignes": args.ventes, **resultats}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Test de charge « changement d'équipe » : de nombreuses connexions simultanées.
+
+Usage (depuis la racine du projet) :
+    HASH_MAX_CONCURRENCY=2 python -m backend.benchmarks.bench_login --caissiers 30
+
+Crée `--caissiers` comptes, les connecte tous en même temps sur /api/token et
+mesure pendant ce temps la latence de /api/dashboard. Affiche les percentiles
+des deux, ainsi que les métriques de la file de hachage.
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+
+from . import _commun
+
+
+async def executer(args):
+    db = _commun.preparer_base()
+    _commun.inserer_donnees(db, n_produits=100, n_ventes=1000)
+    with db.get_db() as session:
+        for i in range(args.caissiers):
+            db.create_user(session, {"username": f"caissier{i}", "email": f"caissier{i}@example.com", "password": f"mdp{i}", "roles": []})
+
+    from .. import main, passwords
+    entetes = _commun.entetes_admin()
+    transport = httpx.ASGITransport(app=main.app)
+    latences_login, latences_dashboard = [], []
+
+    async with main.app.router.lifespan_context(main.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            async def connexion(i):
+                debut = time.perf_counter()
+                response = await client.post("/api/token", data={"username": f"caissier{i}", "password": f"mdp{i}"})
+                response.raise_for_status()
+                latences_login.append(time.perf_counter() - debut)
+
+            async def sonde_dashboard(arret: asyncio.Event):
+                while not arret.is_set():
+                    debut = time.perf_counter()
+                    response = await client.get("/api/dashboard", headers=entetes)
+                    response.raise_for_status()
+                    latences_dashboard.append(time.perf_counter() - debut)
+                    await asyncio.sleep(0.01)
+
+            arret = asyncio.Event()
+            sonde = asyncio.create_task(sonde_dashboard(arret))
+            with _commun.Chrono() as chrono:
+                await asyncio.gather(*(connexion(i) for i in range(args.caissiers)))
+            arret.set()
+            await sonde
+
+    print(json.dumps({
+        "caissiers": args.caissiers,
+        "duree_totale_s": round(chrono.duree, 2),
+        "login": _commun.resume_latences(latences_login),
+        "dashboard_pendant_connexions": _commun.resume_latences(latences_dashboard),
+        "hachage": passwords.stats.snapshot(),
+    }, indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--caissiers", type=int, default=30)
+    asyncio.run(executer(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Générateur de données synthétiques réalistes pour les benchmarks.
+
+Usage (depuis la racine du projet) :
+    python -m backend.benchmarks.generateur --produits 10000 --ventes 10000000 --url sqlite:///magasin_bench.db
+
+Sans --url, la base est créée dans un dossier temporaire (chemin affiché).
+La base cible doit être vide : elle reçoit les rôles, l'administrateur de
+benchmark (_commun.ADMIN_USERNAME), quelques caissiers, puis :
+  - des produits aux prix et stocks variés (dont une partie en stock faible) ;
+  - des ventes réparties sur `--jours` jours avec une croissance de l'activité
+    (les jours récents sont plus chargés), un rythme hebdomadaire (samedi fort,
+    dimanche faible) et des pics horaires (midi, fin de journée). La popularité
+    des produits suit une loi de Zipf : quelques produits font l'essentiel des
+    ventes ;
+  - des pertes (`--taux-pertes` des ventes) et des frais annexes.
+L'agrégat journalier, le registre des mouvements de stock et l'index de
+recherche sont ensuite reconstruits. La même graine donne les mêmes
+données.
+"""
+import argparse
+import itertools
+import json
+import random
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+from sqlalchemy import insert
+
+from . import _commun
+
+TAILLE_LOT = 50_000
+
+CAISSIERS = 5
+# Poids des quantités 1, 2, 3... d'une ligne de vente.
+POIDS_QUANTITE = (60, 25, 8, 4, 2, 1)
+# Activité relative par jour de la semaine (lundi = 0).
+POIDS_SEMAINE = (0.9, 0.85, 0.9, 1.0, 1.2, 1.5, 0.6)
+# Activité relative par heure (UTC), magasin ouvert de 8 h à 20 h.
+POIDS_HEURE = (0,) * 8 + (2, 4, 6, 8, 12, 10, 6, 5, 6, 9, 11, 7) + (0,) * 4
+# Activité du premier jour de la période, relative au dernier (croissance).
+ACTIVITE_INITIALE = 0.5
+DESCRIPTIONS_FRAIS = ("Transport", "Emballage", "Stockage", "Douane", "Manutention")
+
+
+def poids_cumules(poids):
+    return list(itertools.accumulate(poids))
+
+
+def tirer_dates(rng, n: int, jours: int, maintenant: datetime):
+    """`n` dates sur les `jours` derniers jours selon la croissance et les rythmes hebdomadaire et horaire."""
+    premier = (maintenant - timedelta(days=jours - 1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    poids_jours = poids_cumules(
+        (ACTIVITE_INITIALE + (1 - ACTIVITE_INITIALE) * i / max(jours - 1, 1)) * POIDS_SEMAINE[(premier + timedelta(days=i)).weekday()]
+        for i in range(jours)
+    )
+    poids_heures = poids_cumules(POIDS_HEURE)
+    jours_tires = rng.choices(range(jours), cum_weights=poids_jours, k=n)
+    heures = rng.choices(range(24), cum_weights=poids_heures, k=n)
+    dates = []
+    for jour, heure in zip(jours_tires, heures):
+        date = premier + timedelta(days=jour, hours=heure, seconds=rng.random() * 3600)
+        dates.append(min(date, maintenant))
+    return dates
+
+
+def inserer_par_lots(conn, table, lignes):
+    lot = []
+    for ligne in lignes:
+        lot.append(ligne)
+        if len(lot) == TAILLE_LOT:
+            conn.execute(insert(table), lot)
+            lot = []
+    if lot:
+        conn.execute(insert(table), lot)
+
+
+def generer(db, n_produits: int, n_ventes: int, jours: int = 730, taux_pertes: float = 0.02,
+            n_frais: int = None, graine: int = 42) -> dict:
+    """Remplit la base (vide, administrateur déjà créé) ; retourne les volumes insérés."""
+    rng = random.Random(graine)
+    maintenant = datetime.now(timezone.utc).replace(tzinfo=None)
+    n_pertes = round(n_ventes * taux_pertes)
+    n_frais = max(1, n_ventes // 200) if n_frais is None else n_frais
+
+    with db.get_db() as session:
+        for i in range(1, CAISSIERS + 1):
+            db.create_user(session, {
+                "username": f"caissier{i}", "email": f"caissier{i}@example.com",
+                "password": _commun.ADMIN_PASSWORD, "roles": [],
+            })
+        ids_vendeurs = [user.id for user in session.query(db.User).all()]
+
+    prix_vente = []
+    produits = []
+    for i in range(1, n_produits + 1):
+        achat = Decimal(rng.randint(50, 50_000)).scaleb(-2)
+        vente = (achat * Decimal(rng.uniform(1.15, 1.8))).quantize(Decimal("0.01"))
+        prix_vente.append(vente)
+        # Un produit sur vingt en stock faible, pour le tableau de bord.
+        quantite = rng.randint(0, 9) if rng.random() < 0.05 else rng.randint(50, 5000)
+        produits.append({"nom": f"Produit {i:06d}", "prix_achat": achat, "prix_vente": vente, "quantite": quantite})
+    # Rang de popularité aléatoire : le produit 1 n'est pas forcément le plus vendu.
+    rangs = list(range(n_produits))
+    rng.shuffle(rangs)
+    poids_produits = poids_cumules(1 / (rang + 1) for rang in rangs)
+
+    def lignes_ventes():
+        restantes = n_ventes
+        while restantes:
+            n = min(TAILLE_LOT, restantes)
+            restantes -= n
+            ids = rng.choices(range(1, n_produits + 1), cum_weights=poids_produits, k=n)
+            quantites = rng.choices(range(1, len(POIDS_QUANTITE) + 1), weights=POIDS_QUANTITE, k=n)
+            for produit_id, quantite, date in zip(ids, quantites, tirer_dates(rng, n, jours, maintenant)):
+                yield {
+                    "produit_id": produit_id, "quantite": quantite,
+                    "prix_total": prix_vente[produit_id - 1] * quantite,
+                    "date": date, "user_id": rng.choice(ids_vendeurs),
+                }
+
+    def lignes_pertes():
+        ids = rng.choices(range(1, n_produits + 1), cum_weights=poids_produits, k=n_pertes)
+        for produit_id, date in zip(ids, tirer_dates(rng, n_pertes, jours, maintenant)):
+            yield {"produit_id": produit_id, "quantite": rng.randint(1, 3), "date": date, "user_id": rng.choice(ids_vendeurs)}
+
+    def lignes_frais():
+        for date in tirer_dates(rng, n_frais, jours, maintenant):
+            yield {
+                "produit_id": rng.randint(1, n_produits), "description": rng.choice(DESCRIPTIONS_FRAIS),
+                "montant": Decimal(rng.randint(100, 200_000)).scaleb(-2), "date": date, "user_id": ids_vendeurs[0],
+            }
+
+    with db.engine.begin() as conn:
+        inserer_par_lots(conn, db.Produit, produits)
+        inserer_par_lots(conn, db.Vente, lignes_ventes())
+        inserer_par_lots(conn, db.Perte, lignes_pertes())
+        inserer_par_lots(conn, db.FraisAnnexe, lignes_frais())
+    # Les faits sont insérés directement : l'agrégat journalier, le registre
+    # des mouvements de stock et l'index de recherche sont reconstruits.
+    with db.get_db() as session:
+        db.rebuild_daily_stats(session)
+        db.init_stock_ledger(session)
+        db.rebuild_search_index(session)
+    return {"produits": n_produits, "ventes": n_ventes, "pertes": n_pertes, "frais": n_frais, "jours": jours}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="base cible (vide), ex. sqlite:///magasin_bench.db ; temporaire par défaut")
+    parser.add_argument("--produits", type=int, default=10_000)
+    parser.add_argument("--ventes", type=int, default=1_000_000)
+    parser.add_argument("--jours", type=int, default=730)
+    parser.add_argument("--taux-pertes", type=float, default=0.02)
+    parser.add_argument("--frais", type=int, default=None, help="nombre de frais annexes (ventes / 200 par défaut)")
+    parser.add_argument("--graine", type=int, default=42)
+    args = parser.parse_args()
+
+    db = _commun.preparer_base(url=args.url)
+    with _commun.Chrono() as chrono:
+        volumes = generer(db, args.produits, args.ventes, args.jours, args.taux_pertes, args.frais, args.graine)
+    print(json.dumps({"url": db.engine.url.render_as_string(hide_password=True), **volumes, "duree_s": round(chrono.duree, 1)}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime, timezone
+
+# ==============================================================================
+# CONFIGURATION
+# ==============================================================================
+
+CACHE_MAXSIZE = int(os.getenv("CACHE_MAXSIZE", "256"))
+CACHE_TTL_SECONDS = float(os.getenv("CACHE_TTL_SECONDS", "30"))
+# Analyses de périodes passées : les invalidations ne touchent que le processus
+# qui écrit (pas les autres workers, ni manage.py rebuild-stats / migrate-money),
+# ce délai borne donc le temps pendant lequel un résultat périmé peut être servi.
+CACHE_ANALYSE_PASSEE_TTL_SECONDS = float(os.getenv("CACHE_ANALYSE_PASSEE_TTL_SECONDS", "600"))
+PRINCIPAL_CACHE_MAXSIZE = int(os.getenv("PRINCIPAL_CACHE_MAXSIZE", "1024"))
+PRINCIPAL_CACHE_TTL_SECONDS = float(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "60"))
+
+# ==============================================================================
+# CACHE LRU AVEC EXPIRATION
+# ==============================================================================
+
+class TTLCache:
+    """
+    Cache en mémoire du processus, borné (LRU) et à expiration (TTL), sûr entre
+    threads. Une entrée stockée avec ttl=None n'expire jamais et ne disparaît
+    que par éviction LRU ou invalidation.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entrees = OrderedDict()
+        self._generation = 0
+        self._verrou = threading.Lock()
+
+    def get_or_set(self, cle, calcul, ttl="defaut"):
+        """
+        Retourne la valeur en cache pour `cle`, sinon l'obtient via `calcul()` et la
+        stocke. Si une invalidation survient pendant le calcul, le résultat est
+        retourné mais pas mis en cache (il peut être antérieur à l'écriture).
+        """
+        ttl = self.ttl if ttl == "defaut" else ttl
+        with self._verrou:
+            entree = self._entrees.get(cle)
+            if entree is not None and (entree[1] is None or entree[1] > time.monotonic()):
+                self._entrees.move_to_end(cle)
+                self.hits += 1
+                return entree[0]
+            self.misses += 1
+            generation = self._generation
+
+        valeur = calcul()
+
+        with self._verrou:
+            if generation == self._generation:
+                expiration = None if ttl is None else time.monotonic() + ttl
+                self._entrees[cle] = (valeur, expiration)
+                self._entrees.move_to_end(cle)
+                while len(self._entrees) > self.maxsize:
+                    self._entrees.popitem(last=False)
+        return valeur
+
+    def invalider(self, predicat=None):
+        """Supprime les entrées dont la clé vérifie `predicat` (toutes si None)."""
+        with self._verrou:
+            self._generation += 1
+            for cle in [cle for cle in self._entrees if predicat is None or predicat(cle)]:
+                del self._entrees[cle]
+
+    def stats(self):
+        with self._verrou:
+            return {"taille": len(self._entrees), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
+
+# ==============================================================================
+# CACHE DES RÉSULTATS D'AGRÉGATS (dashboard et analyse)
+# ==============================================================================
+
+# Clés : ("dashboard", jour) et ("analyse", jour_debut, jour_fin).
+# Les invalidations ne touchent que le cache du processus qui écrit : les autres
+# workers servent leurs entrées, périmées, jusqu'à leur expiration
+# (CACHE_TTL_SECONDS, CACHE_ANALYSE_PASSEE_TTL_SECONDS pour une période passée).
+resultats = TTLCache(CACHE_MAXSIZE, CACHE_TTL_SECONDS)
+
+def ttl_analyse(jour_fin: date):
+    """
+    Une période entièrement passée ne change plus que par une écriture datée dans
+    le passé : elle est gardée plus longtemps, mais pas indéfiniment, une écriture
+    faite par un autre processus ne l'invalidant pas ici.
+    """
+    return CACHE_ANALYSE_PASSEE_TTL_SECONDS if jour_fin < datetime.now(timezone.utc).date() else resultats.ttl
+
+def invalider_dashboard():
+    resultats.invalider(lambda cle: cle[0] == "dashboard")
+
+def invalider_analyse(jour: date = None):
+    """Invalide les analyses dont la période contient `jour` (toutes si None)."""
+    resultats.invalider(lambda cle: cle[0] == "analyse" and (jour is None or cle[1] <= jour <= cle[2]))
+
+# ==============================================================================
+# CACHE DES UTILISATEURS AUTHENTIFIÉS
+# ==============================================================================
+
+# Clé : nom d'utilisateur. Valeur : auth.Principal (ou None si l'utilisateur n'existe pas).
+principals = TTLCache(PRINCIPAL_CACHE_MAXSIZE, PRINCIPAL_CACHE_TTL_SECONDS)
+
+def invalider_principals(*usernames):
+    principals.invalider(lambda cle: cle in usernames)
+
+# ==============================================================================
+# VERSIONS DES TABLES (ETag des listes)
+# ==============================================================================
+
+def etag(liste: str, version: int) -> str:
+    """
+    ETag d'une liste à sa `version` (database.get_version). La version est lue en
+    base et incrémentée par chaque écriture : tous les processus (workers,
+    manage.py) voient la même.
+    """
+    return f'"{liste}-{version}"'
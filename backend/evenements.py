@@ -0,0 +1,105 @@
+import asyncio
+import json
+import os
+import threading
+
+# ==============================================================================
+# CONFIGURATION
+# ==============================================================================
+
+# Nombre de messages en attente par client avant de le considérer trop lent.
+EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "100"))
+# Un commentaire est envoyé après ce délai sans événement, pour garder la
+# connexion ouverte à travers les proxys.
+EVENTS_KEEPALIVE_SECONDS = float(os.getenv("EVENTS_KEEPALIVE_SECONDS", "15"))
+
+# ==============================================================================
+# DIFFUSION EN PROCESSUS (PUB/SUB)
+# ==============================================================================
+
+class Abonne:
+    def __init__(self, taille_file: int):
+        self.file = asyncio.Queue(maxsize=taille_file)
+        self.deborde = False
+
+class Diffuseur:
+    """
+    Répartit chaque événement publié vers tous les clients connectés. La
+    publication peut venir de n'importe quel thread (routes `def`) : le message
+    est sérialisé une fois puis remis à la boucle d'événements. Chaque client a
+    une file bornée ; un client qui ne suit pas est déconnecté plutôt que de
+    faire grossir la mémoire, et rechargera l'état complet à sa reconnexion.
+    """
+    def __init__(self, taille_file: int):
+        self.taille_file = taille_file
+        self._abonnes = set()
+        self._boucle = None
+        self._verrou = threading.Lock()
+        self.publies = 0
+        self.deconnexions_lentes = 0
+
+    def demarrer(self, boucle: asyncio.AbstractEventLoop):
+        self._boucle = boucle
+
+    def arreter(self):
+        self._boucle = None
+
+    def abonner(self) -> Abonne:
+        abonne = Abonne(self.taille_file)
+        self._abonnes.add(abonne)
+        return abonne
+
+    def desabonner(self, abonne: Abonne):
+        self._abonnes.discard(abonne)
+
+    def publier(self, type_evenement: str, donnees: dict):
+        boucle = self._boucle
+        if boucle is None or not self._abonnes:
+            return
+        message = f"event: {type_evenement}\ndata: {json.dumps(donnees, default=float)}\n\n".encode("utf-8")
+        with self._verrou:
+            self.publies += 1
+        try:
+            boucle.call_soon_threadsafe(self._repartir, message)
+        except RuntimeError:
+            pass  # Boucle fermée (arrêt de l'application).
+
+    def _repartir(self, message: bytes):
+        for abonne in list(self._abonnes):
+            try:
+                abonne.file.put_nowait(message)
+            except asyncio.QueueFull:
+                abonne.deborde = True
+                self._abonnes.discard(abonne)
+                self.deconnexions_lentes += 1
+
+    def stats(self):
+        return {
+            "clients": len(self._abonnes),
+            "publies": self.publies,
+            "deconnexions_lentes": self.deconnexions_lentes,
+        }
+
+diffuseur = Diffuseur(EVENTS_QUEUE_SIZE)
+
+def publier(type_evenement: str, donnees: dict):
+    diffuseur.publier(type_evenement, donnees)
+
+async def flux_sse(abonne: Abonne):
+    """
+    Générateur de la réponse text/event-stream d'un client. Il se termine si le
+    client a débordé ; la déconnexion du client annule le générateur.
+    """
+    try:
+        yield b"retry: 3000\n\n"
+        while True:
+            try:
+                message = await asyncio.wait_for(abonne.file.get(), EVENTS_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield b": keepalive\n\n"
+                continue
+            if abonne.deborde:
+                return
+            yield message
+    finally:
+        diffuseur.desabonner(abonne)
@@ -0,0 +1,59 @@
+import csv
+import io
+import os
+import tempfile
+from datetime import date
+from . import database as db
+from . import replique
+
+# ==============================================================================
+# EXPORT EN FLUX (CSV / XLSX)
+# ==============================================================================
+
+# Nombre de lignes accumulées avant d'émettre un morceau de la réponse CSV.
+LIGNES_PAR_MORCEAU = 1000
+
+def flux_csv(type_donnees: str, start_date: date = None, end_date: date = None):
+    """
+    Générateur de morceaux CSV. Il ouvre sa propre session : la réponse est
+    envoyée après la fin de l'endpoint, la session de la requête est alors fermée.
+    """
+    with replique.get_read_db() as session:
+        tampon = io.StringIO()
+        writer = csv.writer(tampon)
+        for i, ligne in enumerate(db.iter_export(session, type_donnees, start_date, end_date), start=1):
+            writer.writerow(ligne)
+            if i % LIGNES_PAR_MORCEAU == 0:
+                yield tampon.getvalue().encode("utf-8")
+                tampon.seek(0)
+                tampon.truncate()
+        yield tampon.getvalue().encode("utf-8")
+
+def flux_xlsx(type_donnees: str, start_date: date = None, end_date: date = None, taille_morceau: int = 64 * 1024):
+    """
+    Générateur de morceaux XLSX. Le classeur est écrit en mode write-only
+    d'openpyxl (les lignes vont sur disque au fil de l'eau), puis le fichier
+    temporaire est relu par morceaux et supprimé.
+    """
+    from openpyxl import Workbook
+
+    fd, chemin = tempfile.mkstemp(suffix=".xlsx")
+    os.close(fd)
+    try:
+        classeur = Workbook(write_only=True)
+        feuille = classeur.create_sheet(title=type_donnees)
+        with replique.get_read_db() as session:
+            for ligne in db.iter_export(session, type_donnees, start_date, end_date):
+                feuille.append(ligne)
+        classeur.save(chemin)
+
+        with open(chemin, "rb") as fichier:
+            while morceau := fichier.read(taille_morceau):
+                yield morceau
+    finally:
+        os.remove(chemin)
+
+FORMATS = {
+    "csv": (flux_csv, "text/csv; charset=utf-8"),
+    "xlsx": (flux_xlsx, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+}
@@ -0,0 +1,107 @@
+import csv
+import io
+import os
+import zipfile
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from . import database as db
+
+# ==============================================================================
+# IMPORT DU CATALOGUE PRODUITS (CSV / XLSX)
+# ==============================================================================
+
+# Nombre de lignes insérées/mises à jour par transaction.
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "1000"))
+
+COLONNES = ("nom", "prix_achat", "prix_vente", "quantite")
+
+def _lignes_csv(fichier):
+    texte = io.TextIOWrapper(fichier, encoding="utf-8-sig", newline="")
+    try:
+        yield from csv.reader(texte)
+    finally:
+        # Le fichier appartient à l'appelant : on ne le ferme pas avec le wrapper.
+        texte.detach()
+
+def _lignes_xlsx(fichier):
+    from openpyxl import load_workbook
+    from openpyxl.utils.exceptions import InvalidFileException
+
+    try:
+        classeur = load_workbook(fichier, read_only=True, data_only=True)
+    except (zipfile.BadZipFile, InvalidFileException, KeyError):
+        raise ValueError("Fichier XLSX illisible.")
+    try:
+        yield from classeur.active.iter_rows(values_only=True)
+    finally:
+        classeur.close()
+
+LECTEURS = {"csv": _lignes_csv, "xlsx": _lignes_xlsx}
+
+def _nombre(brut) -> Decimal:
+    try:
+        valeur = Decimal(str(brut).strip().replace(",", "."))
+    except InvalidOperation:
+        raise ValueError
+    if not valeur.is_finite():
+        raise ValueError
+    return valeur
+
+def _entier(brut) -> int:
+    valeur = _nombre(brut)
+    if valeur != valeur.to_integral_value():
+        raise ValueError
+    return int(valeur)
+
+def _valider(valeurs: dict) -> dict:
+    """Convertit une ligne brute en produit. Lève ValueError avec un message lisible."""
+    nom = str(valeurs["nom"] or "").strip()
+    if not nom:
+        raise ValueError("Le nom est obligatoire.")
+    produit = {"nom": nom}
+    for colonne, conversion in (("prix_achat", _nombre), ("prix_vente", _nombre), ("quantite", _entier)):
+        brut = valeurs[colonne]
+        try:
+            valeur = conversion(brut)
+        except (TypeError, ValueError):
+            raise ValueError(f"Valeur invalide pour {colonne} : {brut!r}.")
+        if valeur < 0:
+            raise ValueError(f"{colonne} ne peut pas être négatif.")
+        produit[colonne] = valeur
+    return produit
+
+def importer_produits(session, fichier, format: str, taille_lot: int = None) -> dict:
+    """
+    Lit le fichier par lots de `taille_lot` lignes et upserte chaque lot par nom.
+    Chaque lot est validé dans sa propre transaction : les lignes invalides sont
+    écartées et rapportées avec leur numéro de ligne dans le fichier (l'en-tête
+    est la ligne 1). Lève ValueError si l'en-tête ne contient pas les colonnes.
+    """
+    taille_lot = taille_lot or IMPORT_BATCH_SIZE
+    lignes = LECTEURS[format](fichier)
+    try:
+        entete = [str(colonne or "").strip().lower() for colonne in next(lignes, [])]
+        manquantes = [colonne for colonne in COLONNES if colonne not in entete]
+        if manquantes:
+            raise ValueError(f"Colonnes manquantes dans l'en-tête : {', '.join(manquantes)}.")
+        positions = {colonne: entete.index(colonne) for colonne in COLONNES}
+
+        rapport = {"lignes": 0, "crees": 0, "mis_a_jour": 0, "erreurs": []}
+        numerotees = enumerate(lignes, start=2)
+        while lot_brut := list(islice(numerotees, taille_lot)):
+            lot = []
+            for numero, ligne in lot_brut:
+                if not any(cellule not in (None, "") for cellule in ligne):
+                    continue
+                rapport["lignes"] += 1
+                try:
+                    valeurs = {colonne: ligne[i] if i < len(ligne) else None for colonne, i in positions.items()}
+                    lot.append(_valider(valeurs))
+                except ValueError as e:
+                    rapport["erreurs"].append({"ligne": numero, "erreur": str(e)})
+            crees, mis_a_jour = db.upsert_produits(session, lot)
+            rapport["crees"] += crees
+            rapport["mis_a_jour"] += mis_a_jour
+        return rapport
+    finally:
+        lignes.close()
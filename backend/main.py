@@ -1,15 +1,30 @@
+import asyncio
 import os
+import orjson
+from contextlib import asynccontextmanager
 from pathlib import Path
-from fastapi import FastAPI, HTTPException, Depends, status
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
-from pydantic import BaseModel, ConfigDict
-from typing import List, Optional
-from datetime import datetime, timedelta
+import anyio.to_thread
+from fastapi import FastAPI, HTTPException, Depends, File, Query, Request, UploadFile, status
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from pydantic import BaseModel, ConfigDict, Field, PlainSerializer
+from typing import Annotated, Generic, List, Literal, Optional, TypeVar
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
 from sqlalchemy.orm import Session
 from fastapi.security import OAuth2PasswordRequestForm
+from fastapi.concurrency import run_in_threadpool
 from . import database as db
 from . import auth
+from . import cache
+from . import evenements
+from . import export
+from . import importation
+from . import metrics
+from . import passwords
+from . import rapports
+from . import replique
+from . import statique
 
 # ==============================================================================
 # INITIALISATION DE L'APPLICATION
@@ -17,12 +32,39 @@ from . import auth
 
 db.create_db_and_tables()
 
+# Les routes qui accèdent à la base sont déclarées en `def` : FastAPI les exécute
+# dans un pool de threads borné, afin qu'une requête lente (ex. /api/analyse)
+# ne bloque pas la boucle d'événements. La taille de ce pool est configurable.
+DB_THREADPOOL_SIZE = int(os.getenv("DB_THREADPOOL_SIZE", "40"))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    anyio.to_thread.current_default_thread_limiter().total_tokens = DB_THREADPOOL_SIZE
+    replique.demarrer()
+    evenements.diffuseur.demarrer(asyncio.get_running_loop())
+    yield
+    evenements.diffuseur.arreter()
+    replique.arreter()
+    rapports.arreter()
+
 app = FastAPI(
     title="API de Gestion de Magasin V2",
     description="Une API sécurisée pour la gestion de magasin avec authentification et gestion des rôles.",
-    version="2.0.0"
+    version="2.0.0",
+    lifespan=lifespan
 )
 
+# Compression gzip des réponses JSON de l'API. Les flux text/event-stream sont
+# exclus par Starlette, et les fichiers déjà compressés (Content-Encoding) sont
+# transmis tels quels.
+app.add_middleware(GZipMiddleware, minimum_size=statique.GZIP_MINIMUM_SIZE, compresslevel=statique.GZIP_LEVEL)
+# Cookie de la dernière écriture du client, pour lire ses propres écritures
+# quel que soit le worker (sans effet sans réplique).
+app.add_middleware(replique.DerniereEcritureMiddleware)
+# Latences par route et requêtes SQL par requête (exposées sur /metrics). Ajouté
+# en dernier, il englobe la compression et mesure la réponse complète.
+app.add_middleware(metrics.MetricsMiddleware)
+
 # ==============================================================================
 # CHEMINS ABSOLUS POUR LE FRONTEND
 # ==============================================================================
@@ -69,16 +111,29 @@ class Token(BaseModel):
 class TokenData(BaseModel):
     username: Optional[str] = None
 
+# Montant exact (Decimal) côté serveur, nombre dans le JSON pour le frontend.
+Argent = Annotated[Decimal, PlainSerializer(float, return_type=float, when_used="json")]
+
 class ProduitBase(BaseModel):
     nom: str
-    prix_achat: float
-    prix_vente: float
+    prix_achat: Argent
+    prix_vente: Argent
     quantite: int
 
 class Produit(ProduitBase):
     id: int
     model_config = ConfigDict(from_attributes=True)
 
+class ErreurImport(BaseModel):
+    ligne: int
+    erreur: str
+
+class RapportImport(BaseModel):
+    lignes: int
+    crees: int
+    mis_a_jour: int
+    erreurs: List[ErreurImport]
+
 class VenteBase(BaseModel):
     produit_id: int
     quantite: int
@@ -88,11 +143,27 @@ class VenteCreate(VenteBase):
 
 class Vente(VenteBase):
     id: int
-    prix_total: float
+    prix_total: Argent
     date: datetime
     produit: Produit
     model_config = ConfigDict(from_attributes=True)
 
+class VenteLigne(BaseModel):
+    produit_id: int
+    quantite: int = Field(gt=0)
+    date: Optional[datetime] = None
+
+class VenteBatch(BaseModel):
+    # Identifiant du lot choisi par la caisse (ex. UUID), repris tel quel si
+    # elle renvoie le lot : ses ventes ne sont enregistrées qu'une fois.
+    id_lot: str = Field(min_length=1, max_length=64)
+    lignes: List[VenteLigne] = Field(min_length=1, max_length=1000)
+
+class VenteCreee(VenteBase):
+    id: int
+    prix_total: Argent
+    date: datetime
+
 class PerteBase(BaseModel):
     produit_id: int
     quantite: int
@@ -109,7 +180,7 @@ class Perte(PerteBase):
 class FraisAnnexeBase(BaseModel):
     produit_id: int
     description: str
-    montant: float
+    montant: Argent
 
 class FraisAnnexeCreate(FraisAnnexeBase):
     pass
@@ -120,21 +191,56 @@ class FraisAnnexe(FraisAnnexeBase):
     produit: Produit
     model_config = ConfigDict(from_attributes=True)
 
+T = TypeVar("T")
+
+class Page(BaseModel, Generic[T]):
+    items: List[T]
+    next_cursor: Optional[str] = None
+
+class PointGraphe(BaseModel):
+    jour: str
+    ca_jour: Argent
+
+class ProduitRentable(BaseModel):
+    nom: str
+    total_profit: Argent
+
+class ProduitPerdu(BaseModel):
+    nom: str
+    total_lost: int
+
 class AnalyseData(BaseModel):
-    chiffre_affaires: float
-    cogs: float
-    benefice: float
-    depenses: float
-    benefice_net: float
-    graph_data: List[dict]
-    top_profitable_products: List[dict]
-    top_lost_products: List[dict]
+    chiffre_affaires: Argent
+    cogs: Argent
+    benefice: Argent
+    depenses: Argent
+    benefice_net: Argent
+    graph_data: List[PointGraphe]
+    top_profitable_products: List[ProduitRentable]
+    top_lost_products: List[ProduitPerdu]
+
+class RapportDemande(BaseModel):
+    start_date: date
+    end_date: date
+
+class RapportTache(BaseModel):
+    id: str
+    statut: str
+    start_date: date
+    end_date: date
+    erreur: Optional[str] = None
+    model_config = ConfigDict(from_attributes=True)
+
+class StockProduit(BaseModel):
+    produit_id: int
+    nom: str
+    quantite: int
 
 class DashboardData(BaseModel):
-    ca_today: float
+    ca_today: Argent
     ventes_today: int
     total_stock_quantite: int
-    total_stock_valeur: float
+    total_stock_valeur: Argent
     top_ventes_today: List[dict]
     low_stock_produits: List[Produit]
 
@@ -142,16 +248,75 @@ class DashboardData(BaseModel):
 # DÉPENDANCES (Injection et Sécurité)
 # ==============================================================================
 
-def get_db_session():
+def get_db_session(request: Request):
     with db.get_db() as session:
+        # Permet de noter l'auteur des écritures (lecture de ses propres écritures).
+        session.info["etat_requete"] = request.state
         yield session
 
-async def get_current_user(token: str = Depends(auth.oauth2_scheme), db_session: Session = Depends(get_db_session)):
-    return auth.get_current_user(token, db_session)
+def get_current_user(request: Request, token: str = Depends(auth.oauth2_scheme), db_session: Session = Depends(get_db_session)):
+    principal = auth.get_current_user(token, db_session)
+    request.state.username = principal.username
+    return principal
 
 async def get_current_active_user(current_user: User = Depends(get_current_user)):
     return current_user
 
+def get_read_db_session(request: Request, current_user: User = Depends(get_current_active_user)):
+    """Session des routes de lecture : sur la réplique si elle est configurée."""
+    derniere_ecriture = replique.instant_du_cookie(request.cookies.get(replique.COOKIE_ECRITURE))
+    with replique.get_read_db(current_user.username, derniere_ecriture) as session:
+        yield session
+
+class FiltresListe:
+    """Paramètres de pagination et de filtrage communs aux listes ventes/pertes/frais."""
+    def __init__(
+        self,
+        limit: int = Query(50, ge=1, le=500),
+        cursor: Optional[str] = None,
+        produit_id: Optional[int] = None,
+        user_id: Optional[int] = None,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+    ):
+        self.limit = limit
+        self.filtres = dict(cursor=cursor, produit_id=produit_id, user_id=user_id, start_date=start_date, end_date=end_date)
+
+def reponse_json(contenu, headers=None) -> Response:
+    """
+    Réponse JSON encodée directement par orjson, pour les grandes listes déjà
+    projetées en dictionnaires par la base. Retourner une Response court-circuite
+    la validation par `response_model`, qui ne sert alors qu'à la documentation.
+    """
+    return Response(content=orjson.dumps(contenu, default=float), media_type="application/json", headers=headers)
+
+def get_page(fonction, db_session: Session, filtres: FiltresListe):
+    try:
+        items, next_cursor = fonction(db_session, filtres.limit, **filtres.filtres)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return reponse_json({"items": items, "next_cursor": next_cursor})
+
+def non_modifiee(request: Request, response: Response, db_session: Session, liste: str):
+    """
+    Requête conditionnelle sur une liste versionnée (voir cache.etag). Si le
+    client possède déjà la version courante, retourne la réponse 304 à renvoyer
+    telle quelle, après la seule lecture de la version. Sinon, ajoute l'ETag à
+    la réponse et retourne None.
+    L'ETag est lu avant la requête : une écriture concurrente donne au pire un
+    ETag plus ancien que les données, donc un rechargement de trop. Une réplique
+    peut être en retard sur la version courante : ses réponses n'ont pas d'ETag.
+    """
+    etag = cache.etag(liste, db.get_version(db_session, liste))
+    entetes = {"Cache-Control": "private, no-cache"}
+    recus = [valeur.strip().removeprefix("W/") for valeur in request.headers.get("if-none-match", "").split(",")]
+    if etag in recus or "*" in recus:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={**entetes, "ETag": etag})
+    response.headers.update(entetes)
+    if not replique.sur_replique(db_session):
+        response.headers["ETag"] = etag
+    return None
+
 def require_role(role_name: str):
     async def role_checker(current_user: User = Depends(get_current_active_user)):
         if not any(role.name == role_name for role in current_user.roles):
@@ -168,7 +333,7 @@ def require_role(role_name: str):
 
 @app.post("/api/token", response_model=Token)
 async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db_session: Session = Depends(get_db_session)):
-    user = auth.authenticate_user(db_session, form_data.username, form_data.password)
+    user = await auth.authenticate_user(db_session, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -182,7 +347,7 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
     return {"access_token": access_token, "token_type": "bearer"}
 
 @app.get("/api/users/me", response_model=User)
-async def read_users_me(current_user: User = Depends(get_current_active_user)):
+def read_users_me(current_user: User = Depends(get_current_active_user)):
     return current_user
 
 # ==============================================================================
@@ -190,26 +355,28 @@ async def read_users_me(current_user: User = Depends(get_current_active_user)):
 # ==============================================================================
 
 @app.get("/api/users", response_model=List[User], dependencies=[Depends(require_role('admin'))])
-async def get_users(db_session: Session = Depends(get_db_session)):
+def get_users(request: Request, response: Response, db_session: Session = Depends(get_read_db_session)):
+    if reponse := non_modifiee(request, response, db_session, "users"):
+        return reponse
     return db.get_all_users(db_session)
 
 @app.get("/api/roles", response_model=List[Role], dependencies=[Depends(require_role('admin'))])
-async def get_roles(db_session: Session = Depends(get_db_session)):
+def get_roles(db_session: Session = Depends(get_read_db_session)):
     return db.get_all_roles(db_session)
 
 @app.post("/api/users", response_model=User, dependencies=[Depends(require_role('admin'))])
-async def create_user(user: UserCreate, db_session: Session = Depends(get_db_session)):
+def create_user(user: UserCreate, db_session: Session = Depends(get_db_session)):
     db_user = db.get_user_by_username(db_session, username=user.username)
     if db_user:
         raise HTTPException(status_code=400, detail="Ce nom d'utilisateur existe déjà")
     return db.create_user(db=db_session, user_data=user.model_dump())
 
 @app.put("/api/users/{user_id}", response_model=User, dependencies=[Depends(require_role('admin'))])
-async def update_user(user_id: int, user: UserUpdate, db_session: Session = Depends(get_db_session)):
+def update_user(user_id: int, user: UserUpdate, db_session: Session = Depends(get_db_session)):
     return db.update_user(db=db_session, user_id=user_id, user_data=user.model_dump())
 
 @app.delete("/api/users/{user_id}", status_code=status.HTTP_204_NO_CONTENT, dependencies=[Depends(require_role('admin'))])
-async def delete_user(user_id: int, db_session: Session = Depends(get_db_session)):
+def delete_user(user_id: int, db_session: Session = Depends(get_db_session)):
     deleted = db.delete_user(db=db_session, user_id=user_id)
     if not deleted:
         raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
@@ -220,120 +387,286 @@ async def delete_user(user_id: int, db_session: Session = Depends(get_db_session
 # ==============================================================================
 
 @app.get("/api/produits", response_model=List[Produit], dependencies=[Depends(get_current_active_user)])
-async def api_get_produits(db_session: Session = Depends(get_db_session)):
-    return db.get_all_produits(db_session)
+def api_get_produits(request: Request, response: Response, db_session: Session = Depends(get_read_db_session)):
+    if reponse := non_modifiee(request, response, db_session, "produits"):
+        return reponse
+    return reponse_json(db.get_all_produits(db_session), headers=dict(response.headers))
+
+# Déclarée avant les routes /api/produits/{produit_id}.
+@app.get("/api/produits/search", response_model=List[Produit], dependencies=[Depends(get_current_active_user)])
+def api_search_produits(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(20, ge=1, le=100),
+    db_session: Session = Depends(get_read_db_session),
+):
+    """Recherche de produits par nom pour les caisses : seules les meilleures correspondances sont renvoyées."""
+    return reponse_json(db.search_produits(db_session, q, limit))
 
 @app.post("/api/produits", response_model=Produit, dependencies=[Depends(require_role('manager'))])
-async def api_add_produit(produit: ProduitBase, db_session: Session = Depends(get_db_session)):
+def api_add_produit(produit: ProduitBase, db_session: Session = Depends(get_db_session)):
     return db.add_produit(db_session, **produit.model_dump())
 
+@app.post("/api/produits/import", response_model=RapportImport, dependencies=[Depends(require_role('manager'))])
+def api_import_produits(
+    fichier: UploadFile = File(...),
+    taille_lot: Optional[int] = Query(None, ge=1, le=10000),
+    db_session: Session = Depends(get_db_session),
+):
+    format = Path(fichier.filename or "").suffix.lower().lstrip(".")
+    if format not in importation.LECTEURS:
+        raise HTTPException(status_code=400, detail="Format de fichier non supporté (CSV ou XLSX attendu).")
+    try:
+        return importation.importer_produits(db_session, fichier.file, format, taille_lot)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @app.put("/api/produits/{produit_id}", response_model=Produit, dependencies=[Depends(require_role('manager'))])
-async def api_update_produit(produit_id: int, produit: ProduitBase, db_session: Session = Depends(get_db_session)):
+def api_update_produit(produit_id: int, produit: ProduitBase, db_session: Session = Depends(get_db_session)):
     return db.update_produit(db_session, produit_id=produit_id, **produit.model_dump())
 
 @app.delete("/api/produits/{produit_id}", status_code=status.HTTP_204_NO_CONTENT, dependencies=[Depends(require_role('admin'))])
-async def api_delete_produit(produit_id: int, db_session: Session = Depends(get_db_session)):
+def api_delete_produit(produit_id: int, db_session: Session = Depends(get_db_session)):
     deleted = db.delete_produit(db_session, produit_id)
     if not deleted:
         raise HTTPException(status_code=404, detail="Produit non trouvé")
     return
 
-@app.get("/api/ventes", response_model=List[Vente], dependencies=[Depends(get_current_active_user)])
-async def api_get_ventes(db_session: Session = Depends(get_db_session)):
-    return db.get_all_ventes(db_session)
+@app.get("/api/ventes", response_model=Page[Vente], dependencies=[Depends(get_current_active_user)])
+def api_get_ventes(filtres: FiltresListe = Depends(), db_session: Session = Depends(get_read_db_session)):
+    return get_page(db.get_ventes_page, db_session, filtres)
 
 @app.post("/api/ventes", response_model=Vente, dependencies=[Depends(get_current_active_user)])
-async def api_add_vente(vente: VenteCreate, db_session: Session = Depends(get_db_session), current_user: User = Depends(get_current_active_user)):
+def api_add_vente(vente: VenteCreate, db_session: Session = Depends(get_db_session), current_user: User = Depends(get_current_active_user)):
     try:
         return db.add_vente(db_session, user_id=current_user.id, **vente.model_dump())
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+@app.post("/api/ventes/batch", response_model=List[VenteCreee])
+def api_add_ventes_batch(batch: VenteBatch, db_session: Session = Depends(get_db_session), current_user: User = Depends(get_current_active_user)):
+    try:
+        return db.add_ventes_batch(db_session, user_id=current_user.id, id_lot=batch.id_lot, lignes=[ligne.model_dump() for ligne in batch.lignes])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @app.put("/api/ventes/{vente_id}", response_model=Vente, dependencies=[Depends(require_role('manager'))])
-async def api_update_vente(vente_id: int, vente: VenteCreate, db_session: Session = Depends(get_db_session)):
+def api_update_vente(vente_id: int, vente: VenteCreate, db_session: Session = Depends(get_db_session)):
     try:
         return db.update_vente(db_session, vente_id, **vente.model_dump())
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.delete("/api/ventes/{vente_id}", status_code=status.HTTP_204_NO_CONTENT, dependencies=[Depends(require_role('admin'))])
-async def api_delete_vente(vente_id: int, db_session: Session = Depends(get_db_session)):
+def api_delete_vente(vente_id: int, db_session: Session = Depends(get_db_session)):
     deleted = db.delete_vente(db_session, vente_id)
     if not deleted:
         raise HTTPException(status_code=404, detail="Vente non trouvée")
     return
 
-@app.get("/api/pertes", response_model=List[Perte], dependencies=[Depends(get_current_active_user)])
-async def api_get_pertes(db_session: Session = Depends(get_db_session)):
-    return db.get_all_pertes(db_session)
+@app.get("/api/pertes", response_model=Page[Perte], dependencies=[Depends(get_current_active_user)])
+def api_get_pertes(filtres: FiltresListe = Depends(), db_session: Session = Depends(get_read_db_session)):
+    return get_page(db.get_pertes_page, db_session, filtres)
 
 @app.post("/api/pertes", response_model=Perte, dependencies=[Depends(get_current_active_user)])
-async def api_add_perte(perte: PerteCreate, db_session: Session = Depends(get_db_session), current_user: User = Depends(get_current_active_user)):
+def api_add_perte(perte: PerteCreate, db_session: Session = Depends(get_db_session), current_user: User = Depends(get_current_active_user)):
     try:
         return db.add_perte(db_session, user_id=current_user.id, **perte.model_dump())
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.put("/api/pertes/{perte_id}", response_model=Perte, dependencies=[Depends(require_role('manager'))])
-async def api_update_perte(perte_id: int, perte: PerteCreate, db_session: Session = Depends(get_db_session)):
+def api_update_perte(perte_id: int, perte: PerteCreate, db_session: Session = Depends(get_db_session)):
     try:
         return db.update_perte(db_session, perte_id, **perte.model_dump())
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.delete("/api/pertes/{perte_id}", status_code=status.HTTP_204_NO_CONTENT, dependencies=[Depends(require_role('admin'))])
-async def api_delete_perte(perte_id: int, db_session: Session = Depends(get_db_session)):
+def api_delete_perte(perte_id: int, db_session: Session = Depends(get_db_session)):
     deleted = db.delete_perte(db_session, perte_id)
     if not deleted:
         raise HTTPException(status_code=404, detail="Perte non trouvée")
     return
 
-@app.get("/api/frais", response_model=List[FraisAnnexe], dependencies=[Depends(get_current_active_user)])
-async def api_get_frais(db_session: Session = Depends(get_db_session)):
-    return db.get_all_frais(db_session)
+@app.get("/api/frais", response_model=Page[FraisAnnexe], dependencies=[Depends(get_current_active_user)])
+def api_get_frais(filtres: FiltresListe = Depends(), db_session: Session = Depends(get_read_db_session)):
+    return get_page(db.get_frais_page, db_session, filtres)
 
 @app.post("/api/frais", response_model=FraisAnnexe, dependencies=[Depends(get_current_active_user)])
-async def api_add_frais(frais: FraisAnnexeCreate, db_session: Session = Depends(get_db_session), current_user: User = Depends(get_current_active_user)):
+def api_add_frais(frais: FraisAnnexeCreate, db_session: Session = Depends(get_db_session), current_user: User = Depends(get_current_active_user)):
     try:
         return db.add_frais(db_session, user_id=current_user.id, **frais.model_dump())
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.put("/api/frais/{frais_id}", response_model=FraisAnnexe, dependencies=[Depends(require_role('manager'))])
-async def api_update_frais(frais_id: int, frais: FraisAnnexeCreate, db_session: Session = Depends(get_db_session)):
+def api_update_frais(frais_id: int, frais: FraisAnnexeCreate, db_session: Session = Depends(get_db_session)):
     try:
         return db.update_frais(db_session, frais_id, **frais.model_dump())
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.delete("/api/frais/{frais_id}", status_code=status.HTTP_204_NO_CONTENT, dependencies=[Depends(require_role('admin'))])
-async def api_delete_frais(frais_id: int, db_session: Session = Depends(get_db_session)):
+def api_delete_frais(frais_id: int, db_session: Session = Depends(get_db_session)):
     deleted = db.delete_frais(db_session, frais_id)
     if not deleted:
         raise HTTPException(status_code=404, detail="Frais non trouvé")
     return
 
+@app.get("/api/export/{type_donnees}", dependencies=[Depends(require_role('admin'))])
+def api_export(
+    type_donnees: Literal["ventes", "pertes", "frais"],
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    format: Literal["csv", "xlsx"] = "csv",
+):
+    flux, media_type = export.FORMATS[format]
+    nom_fichier = f"{type_donnees}_{start_date or 'debut'}_{end_date or 'fin'}.{format}"
+    return StreamingResponse(
+        flux(type_donnees, start_date, end_date),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{nom_fichier}"'}
+    )
+
+def resultat_en_cache(db_session: Session, cle, calcul, ttl="defaut"):
+    """
+    Sert `calcul()` depuis le cache des résultats. Un résultat lu sur la réplique
+    n'y est jamais stocké : calculé avant qu'elle ait rattrapé une écriture, il
+    serait ensuite servi à l'auteur de cette écriture, resté sur la base principale.
+    """
+    if replique.sur_replique(db_session):
+        return calcul()
+    return cache.resultats.get_or_set(cle, calcul, ttl=ttl)
+
+def get_analyse(db_session: Session, start_date: date, end_date: date) -> AnalyseData:
+    """Analyse financière de la période, servie depuis le cache des résultats si possible."""
+    return resultat_en_cache(
+        db_session,
+        ("analyse", start_date, end_date),
+        lambda: AnalyseData.model_validate(db.get_analyse_financiere(db_session, f"{start_date}T00:00:00", f"{end_date}T23:59:59")),
+        ttl=cache.ttl_analyse(end_date)
+    )
+
 @app.get("/api/analyse", response_model=AnalyseData, dependencies=[Depends(require_role('admin'))])
-async def api_get_analyse(start_date: str, end_date: str, db_session: Session = Depends(get_db_session)):
+def api_get_analyse(start_date: str, end_date: str, db_session: Session = Depends(get_read_db_session)):
     try:
-        start_date_iso = f"{start_date}T00:00:00"
-        end_date_iso = f"{end_date}T23:59:59"
-        return db.get_analyse_financiere(db_session, start_date_iso, end_date_iso)
+        return get_analyse(db_session, date.fromisoformat(start_date), date.fromisoformat(end_date))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erreur lors de l'analyse: {e}")
 
+@app.post("/api/rapports", response_model=RapportTache, status_code=status.HTTP_202_ACCEPTED, dependencies=[Depends(require_role('admin'))])
+def api_submit_rapport(demande: RapportDemande, db_session: Session = Depends(get_read_db_session)):
+    analyse = get_analyse(db_session, demande.start_date, demande.end_date)
+    try:
+        return rapports.soumettre(demande.start_date, demande.end_date, analyse.model_dump(mode="json"))
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+@app.get("/api/rapports/{tache_id}", response_model=RapportTache, dependencies=[Depends(require_role('admin'))])
+async def api_get_rapport(tache_id: str):
+    tache = rapports.get_tache(tache_id)
+    if tache is None:
+        raise HTTPException(status_code=404, detail="Rapport non trouvé")
+    return tache
+
+@app.get("/api/rapports/{tache_id}/pdf", dependencies=[Depends(require_role('admin'))])
+async def api_get_rapport_pdf(tache_id: str):
+    tache = rapports.get_tache(tache_id)
+    if tache is None:
+        raise HTTPException(status_code=404, detail="Rapport non trouvé")
+    if tache.statut != "termine":
+        raise HTTPException(status_code=409, detail=f"Rapport non disponible (statut : {tache.statut})")
+    pdf = rapports.get_pdf(tache)
+    if pdf is None:
+        raise HTTPException(status_code=410, detail="Rapport expiré, veuillez le redemander")
+    nom_fichier = f"rapport_{tache.start_date}_{tache.end_date}.pdf"
+    return Response(content=pdf, media_type="application/pdf", headers={"Content-Disposition": f'attachment; filename="{nom_fichier}"'})
+
+@app.get("/api/stock", response_model=List[StockProduit], dependencies=[Depends(require_role('manager'))])
+def api_get_stock(
+    date_stock: Optional[date] = Query(None, alias="date"),
+    produit_id: Optional[int] = None,
+    db_session: Session = Depends(get_read_db_session),
+):
+    """Stock de chaque produit à la fin du jour `date` (aujourd'hui par défaut), reconstitué depuis le registre des mouvements."""
+    fin_du_jour = datetime.combine((date_stock or db.aujourdhui()) + timedelta(days=1), time())
+    return db.get_stock_at(db_session, fin_du_jour, produit_id)
+
 @app.get("/api/dashboard", response_model=DashboardData, dependencies=[Depends(get_current_active_user)])
-async def api_get_dashboard_kpis(db_session: Session = Depends(get_db_session)):
-    return db.get_dashboard_kpis(db_session)
+def api_get_dashboard_kpis(db_session: Session = Depends(get_read_db_session)):
+    return resultat_en_cache(
+        db_session,
+        ("dashboard", db.aujourdhui()),
+        lambda: DashboardData.model_validate(db.get_dashboard_kpis(db_session))
+    )
+
+@app.get("/api/stats", dependencies=[Depends(require_role('admin'))])
+def api_get_stats():
+    return {
+        "cache": cache.resultats.stats(),
+        "principals": cache.principals.stats(),
+        "hachage": passwords.stats.snapshot(),
+        "evenements": evenements.diffuseur.stats(),
+    }
+
+def verifier_jeton_metriques(request: Request):
+    """/metrics n'existe que si METRICS_TOKEN est configuré, et exige ce jeton."""
+    if not metrics.METRICS_TOKEN:
+        raise HTTPException(status_code=404)
+    if not metrics.jeton_valide(request.headers.get("authorization", "")):
+        raise HTTPException(status_code=401, detail="Jeton de métriques invalide", headers={"WWW-Authenticate": "Bearer"})
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False, dependencies=[Depends(verifier_jeton_metriques)])
+def api_metrics():
+    """Métriques au format Prometheus : latences et requêtes SQL par route, caches, hachage, événements."""
+    jauges = {}
+    for nom, stats in (("cache_resultats", cache.resultats.stats()), ("cache_principals", cache.principals.stats())):
+        jauges[f"magasin_{nom}_taille"] = ("Entrées en cache.", stats["taille"])
+        jauges[f"magasin_{nom}_hits"] = ("Lectures servies par le cache (cumul).", stats["hits"])
+        jauges[f"magasin_{nom}_misses"] = ("Lectures non servies par le cache (cumul).", stats["misses"])
+    hachage = passwords.stats.snapshot()
+    jauges["magasin_hachage_en_attente"] = ("Hachages de mot de passe en attente.", hachage["en_attente"])
+    jauges["magasin_hachage_en_cours"] = ("Hachages de mot de passe en cours.", hachage["en_cours"])
+    jauges["magasin_hachage_termines"] = ("Hachages de mot de passe terminés (cumul).", hachage["termines"])
+    jauges["magasin_hachage_attente_max_secondes"] = ("Attente maximale avant hachage.", hachage["attente_max_ms"] / 1000)
+    evenement = evenements.diffuseur.stats()
+    jauges["magasin_evenements_clients"] = ("Clients connectés au flux /api/events.", evenement["clients"])
+    jauges["magasin_evenements_publies"] = ("Événements publiés (cumul).", evenement["publies"])
+    jauges["magasin_evenements_deconnexions_lentes"] = ("Clients déconnectés pour lenteur (cumul).", evenement["deconnexions_lentes"])
+    if hasattr(db.engine.pool, "checkedout"):
+        jauges["magasin_db_pool_connexions_utilisees"] = ("Connexions du pool en cours d'utilisation.", db.engine.pool.checkedout())
+    return metrics.exposition(jauges)
+
+def principal_depuis_token(token: str):
+    with db.get_db() as session:
+        return auth.get_current_user(token, session)
+
+@app.get("/api/events")
+async def api_events(token: str):
+    """
+    Flux Server-Sent Events des changements de stock, de produits et des ventes
+    du jour. EventSource ne permet pas d'en-tête Authorization : le token JWT
+    est passé en paramètre `token`. La session de base n'est ouverte que le
+    temps de l'authentification, pas pendant toute la durée du flux.
+    """
+    await run_in_threadpool(principal_depuis_token, token)
+    abonne = evenements.diffuseur.abonner()
+    return StreamingResponse(
+        evenements.flux_sse(abonne),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 # ==============================================================================
 # SERVIR L'APPLICATION FRONTEND
 # ==============================================================================
 
-app.mount("/static", StaticFiles(directory=FRONTEND_BUILD_DIR / "static"), name="static")
+# Les fichiers .br/.gz sont générés après `npm run build` par : python -m backend.manage precompress
+app.mount("/static", statique.StaticFilesPrecompresses(directory=FRONTEND_BUILD_DIR / "static"), name="static")
+racine_frontend = statique.StaticFilesPrecompresses(directory=FRONTEND_BUILD_DIR)
 
 @app.get("/{full_path:path}", include_in_schema=False)
-async def serve_react_app(full_path: str):
+async def serve_react_app(full_path: str, request: Request):
     if full_path.startswith("api/") or full_path.startswith("docs") or full_path.startswith("redoc"):
         raise HTTPException(status_code=404)
-    return FileResponse(FRONTEND_BUILD_DIR / "index.html")
+    return await racine_frontend.get_response("index.html", request.scope)
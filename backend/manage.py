@@ -0,0 +1,147 @@
+"""
+Commandes d'administration de la base de données.
+
+Usage (depuis la racine du projet) :
+    python -m backend.manage init-db
+    python -m backend.manage rebuild-stats
+    python -m backend.manage check-stats
+    python -m backend.manage migrate-money
+    python -m backend.manage snapshot-stock [--date 2026-01-01]
+    python -m backend.manage check-stock [--corriger]
+    python -m backend.manage rebuild-search
+    python -m backend.manage precompress
+"""
+import argparse
+import sys
+from datetime import datetime
+from pathlib import Path
+from . import database as db
+from . import statique
+
+
+def init_db(args):
+    """Crée les tables et les index manquants sur la base configurée."""
+    db.create_db_and_tables()
+    print("Tables et index à jour.")
+
+
+def rebuild_stats(args):
+    """Reconstruit l'agrégat journalier daily_product_stats depuis l'historique."""
+    with db.get_db() as session:
+        n = db.rebuild_daily_stats(session)
+    print(f"Agrégat journalier reconstruit : {n} lignes.")
+
+
+def check_stats(args):
+    """Vérifie l'agrégat journalier contre les tables brutes ; code de sortie 1 en cas d'écart."""
+    with db.get_db() as session:
+        ecarts = db.check_daily_stats(session)
+    for ecart in ecarts[:args.max_ecarts]:
+        print(ecart)
+    if ecarts:
+        print(f"{len(ecarts)} écart(s) détecté(s). Lancez 'rebuild-stats' pour corriger.")
+        sys.exit(1)
+    print("Agrégat journalier cohérent.")
+
+
+def snapshot_stock(args):
+    """Enregistre un instantané du stock de chaque produit (minuit UTC du jour par défaut)."""
+    with db.get_db() as session:
+        try:
+            n = db.snapshot_stock(session, args.date)
+        except ValueError as e:
+            print(e)
+            sys.exit(1)
+    print(f"Instantané de stock enregistré : {n} produits.")
+
+
+def check_stock(args):
+    """
+    Vérifie le stock des produits contre le registre des mouvements ; code de
+    sortie 1 en cas d'écart, sauf avec --corriger qui ajoute les corrections.
+    """
+    with db.get_db() as session:
+        ecarts = db.check_stock_ledger(session)
+        for ecart in ecarts[:args.max_ecarts]:
+            print(ecart)
+        if ecarts and args.corriger:
+            db.fix_stock_ledger(session, ecarts)
+            print(f"{len(ecarts)} correction(s) ajoutée(s) au registre.")
+            return
+    if ecarts:
+        print(f"{len(ecarts)} écart(s) détecté(s). Relancez avec --corriger pour aligner le registre sur le stock.")
+        sys.exit(1)
+    print("Registre des mouvements de stock cohérent.")
+
+
+def rebuild_search(args):
+    """Reconstruit l'index de recherche des produits (table FTS5 sous SQLite)."""
+    with db.get_db() as session:
+        n = db.rebuild_search_index(session)
+    print(f"Index de recherche reconstruit : {n} produits.")
+
+
+def migrate_money(args):
+    """
+    Convertit les montants (REAL) d'une base existante en centimes entiers,
+    reconstruit l'agrégat journalier puis le vérifie ; code de sortie 1 en cas d'écart.
+    """
+    rapport = db.migrer_montants(db.engine)
+    if not rapport:
+        print("Montants déjà stockés en centimes : rien à faire.")
+    for table, details in rapport.items():
+        print(f"{table} : {details['lignes']} lignes converties.")
+        for colonne, avant in details["sommes_avant"].items():
+            print(f"  {colonne} : somme avant {avant!r}, après {details['sommes_apres'][colonne]}")
+    db.create_db_and_tables()
+    with db.get_db() as session:
+        db.rebuild_daily_stats(session)
+        ecarts = db.check_daily_stats(session)
+    if ecarts:
+        print(f"{len(ecarts)} écart(s) entre l'agrégat et les tables brutes après migration.")
+        sys.exit(1)
+    print("Migration des montants vérifiée.")
+
+
+def precompress(args):
+    """Écrit les versions .gz (et .br si brotli est installé) des fichiers du build frontend."""
+    totaux = statique.precompresser(args.dossier)
+    print(f"{totaux['fichiers']} fichiers : {totaux['original']} octets, gzip {totaux['gzip']} octets", end="")
+    print(f", brotli {totaux['br']} octets." if totaux["br"] else " (brotli non installé : pas de .br).")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Administration de la base du magasin.")
+    commandes = parser.add_subparsers(dest="commande", required=True)
+
+    commandes.add_parser("init-db", help="crée les tables et les index manquants").set_defaults(fonction=init_db)
+
+    commandes.add_parser("rebuild-stats", help="reconstruit l'agrégat journalier").set_defaults(fonction=rebuild_stats)
+
+    check = commandes.add_parser("check-stats", help="vérifie l'agrégat journalier contre les tables brutes")
+    check.add_argument("--max-ecarts", type=int, default=20, help="nombre maximal d'écarts affichés")
+    check.set_defaults(fonction=check_stats)
+
+    instantane = commandes.add_parser("snapshot-stock", help="enregistre un instantané du stock (tâche périodique)")
+    instantane.add_argument("--date", type=datetime.fromisoformat, help="date UTC de l'instantané, ex. 2026-01-01")
+    instantane.set_defaults(fonction=snapshot_stock)
+
+    stock = commandes.add_parser("check-stock", help="vérifie le stock contre le registre des mouvements")
+    stock.add_argument("--max-ecarts", type=int, default=20, help="nombre maximal d'écarts affichés")
+    stock.add_argument("--corriger", action="store_true", help="ajoute les corrections (le stock des produits fait foi)")
+    stock.set_defaults(fonction=check_stock)
+
+    commandes.add_parser("rebuild-search", help="reconstruit l'index de recherche des produits").set_defaults(fonction=rebuild_search)
+
+    commandes.add_parser("migrate-money", help="convertit les montants en centimes entiers").set_defaults(fonction=migrate_money)
+
+    compression = commandes.add_parser("precompress", help="précompresse le build du frontend (après npm run build)")
+    compression.add_argument("--dossier", type=Path, default=Path(__file__).resolve().parent.parent / "frontend" / "build")
+    compression.set_defaults(fonction=precompress)
+
+    args = parser.parse_args()
+    args.fonction(args)
+
+
+if __name__ == "__main__":
+    main()
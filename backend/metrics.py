@@ -0,0 +1,216 @@
+import bisect
+import hmac
+import logging
+import os
+import threading
+import time
+from contextvars import ContextVar
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# ==============================================================================
+# CONFIGURATION
+# ==============================================================================
+
+# Une requête SQL plus longue que ce seuil (en ms) est journalisée ; 0 désactive.
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+# Ajoute aux réponses les en-têtes X-DB-Queries et X-DB-Time-Ms (tests et
+# benchmarks ; à laisser désactivé en production).
+METRICS_DEBUG_HEADERS = os.getenv("METRICS_DEBUG_HEADERS", "0") == "1"
+
+# Jeton exigé par /metrics (en-tête « Authorization: Bearer <jeton> », le
+# bearer_token de Prometheus). Sans jeton configuré, /metrics n'est pas servi :
+# il expose les latences par route, les caches et le nombre de clients.
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+# Bornes (en secondes) des histogrammes de durée.
+BORNES_DUREE = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Bornes du nombre de requêtes SQL par requête HTTP.
+BORNES_REQUETES_SQL = (0, 1, 2, 3, 5, 8, 13, 21, 50, 100)
+
+# ==============================================================================
+# MÉTRIQUES AU FORMAT PROMETHEUS
+# ==============================================================================
+
+class Compteur:
+    """Compteur par jeu d'étiquettes, sûr entre threads."""
+    type_prometheus = "counter"
+
+    def __init__(self, nom: str, aide: str, etiquettes=()):
+        self.nom = nom
+        self.aide = aide
+        self.etiquettes = etiquettes
+        self._valeurs = {}
+        self._verrou = threading.Lock()
+
+    def ajouter(self, valeurs_etiquettes=(), valeur: float = 1):
+        with self._verrou:
+            self._valeurs[valeurs_etiquettes] = self._valeurs.get(valeurs_etiquettes, 0) + valeur
+
+    def lignes(self):
+        with self._verrou:
+            valeurs = dict(self._valeurs)
+        for valeurs_etiquettes, valeur in sorted(valeurs.items()):
+            yield f"{self.nom}{_etiquettes(self.etiquettes, valeurs_etiquettes)} {_nombre(valeur)}"
+
+class Histogramme:
+    """Histogramme cumulatif par jeu d'étiquettes (séries _bucket, _sum et _count)."""
+    type_prometheus = "histogram"
+
+    def __init__(self, nom: str, aide: str, bornes, etiquettes=()):
+        self.nom = nom
+        self.aide = aide
+        self.bornes = bornes
+        self.etiquettes = etiquettes
+        self._series = {}
+        self._verrou = threading.Lock()
+
+    def observer(self, valeurs_etiquettes, valeur: float):
+        with self._verrou:
+            serie = self._series.get(valeurs_etiquettes)
+            if serie is None:
+                serie = self._series[valeurs_etiquettes] = [[0] * (len(self.bornes) + 1), 0.0]
+            serie[0][bisect.bisect_left(self.bornes, valeur)] += 1
+            serie[1] += valeur
+
+    def lignes(self):
+        with self._verrou:
+            series = {cle: (list(compteurs), somme) for cle, (compteurs, somme) in self._series.items()}
+        for valeurs_etiquettes, (compteurs, somme) in sorted(series.items()):
+            cumul = 0
+            for borne, n in zip((*self.bornes, "+Inf"), compteurs):
+                cumul += n
+                le = borne if borne == "+Inf" else _nombre(borne)
+                yield f"{self.nom}_bucket{_etiquettes((*self.etiquettes, 'le'), (*valeurs_etiquettes, le))} {cumul}"
+            yield f"{self.nom}_sum{_etiquettes(self.etiquettes, valeurs_etiquettes)} {_nombre(somme)}"
+            yield f"{self.nom}_count{_etiquettes(self.etiquettes, valeurs_etiquettes)} {cumul}"
+
+def _nombre(valeur) -> str:
+    return str(int(valeur)) if float(valeur).is_integer() else repr(float(valeur))
+
+def _etiquettes(noms, valeurs) -> str:
+    if not noms:
+        return ""
+    echappees = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for v in valeurs)
+    return "{" + ",".join(f'{nom}="{valeur}"' for nom, valeur in zip(noms, echappees)) + "}"
+
+duree_http = Histogramme(
+    "magasin_http_request_duration_seconds", "Durée des requêtes HTTP par route.",
+    BORNES_DUREE, etiquettes=("method", "route"))
+requetes_http = Compteur(
+    "magasin_http_requests_total", "Requêtes HTTP par route et code de statut.",
+    etiquettes=("method", "route", "status"))
+requetes_sql_par_http = Histogramme(
+    "magasin_db_queries_per_request", "Nombre de requêtes SQL par requête HTTP.",
+    BORNES_REQUETES_SQL, etiquettes=("method", "route"))
+duree_sql_par_http = Histogramme(
+    "magasin_db_time_per_request_seconds", "Temps passé en base par requête HTTP.",
+    BORNES_DUREE, etiquettes=("method", "route"))
+requetes_sql = Compteur("magasin_db_queries_total", "Requêtes SQL exécutées (toutes origines).")
+requetes_sql_lentes = Compteur("magasin_db_slow_queries_total", "Requêtes SQL plus longues que SLOW_QUERY_MS.")
+
+METRIQUES = (duree_http, requetes_http, requetes_sql_par_http, duree_sql_par_http, requetes_sql, requetes_sql_lentes)
+
+def jeton_valide(autorisation: str) -> bool:
+    """Vrai si l'en-tête Authorization porte METRICS_TOKEN (comparaison à temps constant)."""
+    schema, _, jeton = autorisation.partition(" ")
+    return bool(METRICS_TOKEN) and schema.lower() == "bearer" and hmac.compare_digest(jeton.encode(), METRICS_TOKEN.encode())
+
+def exposition(jauges: dict) -> str:
+    """
+    Texte au format d'exposition Prometheus : les métriques ci-dessus, puis les
+    jauges fournies sous la forme {nom: (aide, valeur)}.
+    """
+    lignes = []
+    for metrique in METRIQUES:
+        lignes += [f"# HELP {metrique.nom} {metrique.aide}", f"# TYPE {metrique.nom} {metrique.type_prometheus}"]
+        lignes += metrique.lignes()
+    for nom, (aide, valeur) in jauges.items():
+        lignes += [f"# HELP {nom} {aide}", f"# TYPE {nom} gauge", f"{nom} {_nombre(valeur)}"]
+    return "\n".join(lignes) + "\n"
+
+# ==============================================================================
+# REQUÊTES SQL PAR REQUÊTE HTTP
+# ==============================================================================
+
+class ComptesSQL:
+    def __init__(self):
+        self.requetes = 0
+        self.duree_s = 0.0
+
+# Compteurs de la requête HTTP en cours. Le middleware y place un objet mutable :
+# les routes `def`, exécutées dans le pool de threads, reçoivent une copie du
+# contexte qui référence le même objet.
+comptes_requete: ContextVar = ContextVar("comptes_requete", default=None)
+
+# Le début est porté par le contexte d'exécution de l'instruction : une
+# instruction en échec (after_cursor_execute non appelé) ne laisse rien derrière
+# elle qui fausserait la mesure des suivantes.
+@event.listens_for(Engine, "before_cursor_execute")
+def _avant_execution(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._debut = time.perf_counter()
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _apres_execution(conn, cursor, statement, parameters, context, executemany):
+    debut = getattr(context, "_debut", None)
+    if debut is None:
+        return
+    duree = time.perf_counter() - debut
+    requetes_sql.ajouter()
+    comptes = comptes_requete.get()
+    if comptes is not None:
+        comptes.requetes += 1
+        comptes.duree_s += duree
+    if SLOW_QUERY_MS and duree * 1000 >= SLOW_QUERY_MS:
+        requetes_sql_lentes.ajouter()
+        logger.warning("Requête SQL lente (%.1f ms) : %s", duree * 1000, " ".join(statement.split())[:1000])
+
+# ==============================================================================
+# MIDDLEWARE ASGI
+# ==============================================================================
+
+class MetricsMiddleware:
+    """
+    Mesure chaque requête HTTP jusqu'à la fin de l'envoi de sa réponse. La route
+    est le modèle de chemin (ex. /api/ventes/{vente_id}), pas le chemin reçu :
+    le nombre de séries reste borné. Les flux text/event-stream, ouverts pendant
+    des heures, ne sont pas mesurés.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        comptes = ComptesSQL()
+        racine = scope.get("root_path", "")
+        jeton = comptes_requete.set(comptes)
+        debut = time.perf_counter()
+        etat = {"statut": 500, "flux": False}
+
+        async def envoyer(message):
+            if message["type"] == "http.response.start":
+                etat["statut"] = message["status"]
+                entetes = message.setdefault("headers", [])
+                etat["flux"] = any(nom.lower() == b"content-type" and valeur.startswith(b"text/event-stream") for nom, valeur in entetes)
+                if METRICS_DEBUG_HEADERS:
+                    entetes.append((b"x-db-queries", str(comptes.requetes).encode()))
+                    entetes.append((b"x-db-time-ms", f"{comptes.duree_s * 1000:.1f}".encode()))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, envoyer)
+        finally:
+            comptes_requete.reset(jeton)
+            if not etat["flux"]:
+                # Les montages (ex. /static) allongent root_path au lieu de renseigner la route.
+                route = getattr(scope.get("route"), "path", None) or scope.get("root_path", "")[len(racine):] or "inconnue"
+                etiquettes = (scope["method"], route)
+                duree_http.observer(etiquettes, time.perf_counter() - debut)
+                requetes_http.ajouter((*etiquettes, str(etat["statut"])))
+                requetes_sql_par_http.observer(etiquettes, comptes.requetes)
+                duree_sql_par_http.observer(etiquettes, comptes.duree_s)
@@ -0,0 +1,93 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from passlib.context import CryptContext
+
+# ==============================================================================
+# CONFIGURATION DU HACHAGE DES MOTS DE PASSE
+# ==============================================================================
+
+# Argon2 est volontairement coûteux en CPU et en mémoire : le nombre de hachages
+# simultanés est borné, les demandes en surplus attendent dans la file du pool.
+HASH_MAX_CONCURRENCY = int(os.getenv("HASH_MAX_CONCURRENCY", str(min(4, os.cpu_count() or 1))))
+
+# Contexte unique pour le hachage des mots de passe, partagé par auth et database.
+pwd_context = CryptContext(schemes=["argon2", "bcrypt"], deprecated="auto")
+
+_executor = ThreadPoolExecutor(max_workers=HASH_MAX_CONCURRENCY, thread_name_prefix="hachage")
+
+# ==============================================================================
+# MÉTRIQUES DE LA FILE D'ATTENTE
+# ==============================================================================
+
+class StatsHachage:
+    """Compteurs de la file de hachage : attente courante, temps d'attente cumulé et maximal."""
+
+    def __init__(self):
+        self.en_attente = 0
+        self.en_cours = 0
+        self.termines = 0
+        self.attente_totale_s = 0.0
+        self.attente_max_s = 0.0
+        self._verrou = threading.Lock()
+
+    def soumis(self):
+        with self._verrou:
+            self.en_attente += 1
+
+    def demarre(self, attente_s: float):
+        with self._verrou:
+            self.en_attente -= 1
+            self.en_cours += 1
+            self.attente_totale_s += attente_s
+            self.attente_max_s = max(self.attente_max_s, attente_s)
+
+    def termine(self):
+        with self._verrou:
+            self.en_cours -= 1
+            self.termines += 1
+
+    def snapshot(self):
+        with self._verrou:
+            return {
+                "max_concurrence": HASH_MAX_CONCURRENCY,
+                "en_attente": self.en_attente,
+                "en_cours": self.en_cours,
+                "termines": self.termines,
+                "attente_moyenne_ms": round(self.attente_totale_s / self.termines * 1000, 2) if self.termines else 0.0,
+                "attente_max_ms": round(self.attente_max_s * 1000, 2),
+            }
+
+stats = StatsHachage()
+
+def _soumettre(fonction, *args):
+    """Soumet `fonction(*args)` au pool de hachage en mesurant le temps passé dans la file."""
+    soumission = time.perf_counter()
+    stats.soumis()
+
+    def tache():
+        stats.demarre(time.perf_counter() - soumission)
+        try:
+            return fonction(*args)
+        finally:
+            stats.termine()
+
+    return _executor.submit(tache)
+
+# ==============================================================================
+# API DE HACHAGE
+# ==============================================================================
+
+def hash_password(password: str) -> str:
+    """Hache un mot de passe dans le pool borné (appel bloquant, pour le code synchrone)."""
+    return _soumettre(pwd_context.hash, password).result()
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    """Vérifie un mot de passe dans le pool borné (appel bloquant, pour le code synchrone)."""
+    return _soumettre(pwd_context.verify, plain_password, hashed_password).result()
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Vérifie un mot de passe dans le pool borné sans bloquer la boucle d'événements."""
+    return await asyncio.wrap_future(_soumettre(pwd_context.verify, plain_password, hashed_password))
@@ -0,0 +1,164 @@
+import hashlib
+import html
+import json
+import multiprocessing
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import date, datetime, timezone
+
+# ==============================================================================
+# CONFIGURATION
+# ==============================================================================
+
+# Nombre maximal de rendus PDF simultanés (un processus par rendu).
+REPORT_MAX_RENDERS = int(os.getenv("REPORT_MAX_RENDERS", "2"))
+# Au-delà de ce nombre de rendus en attente, les nouvelles demandes sont refusées.
+REPORT_MAX_PENDING = int(os.getenv("REPORT_MAX_PENDING", "20"))
+# Nombre de PDF conservés en mémoire, par (période, version des données).
+REPORT_CACHE_MAXSIZE = int(os.getenv("REPORT_CACHE_MAXSIZE", "32"))
+# Nombre de tâches dont le statut reste consultable.
+REPORT_MAX_JOBS = int(os.getenv("REPORT_MAX_JOBS", "200"))
+
+# ==============================================================================
+# RENDU (exécuté dans un processus du pool, jamais dans un worker HTTP)
+# ==============================================================================
+
+def _montant(valeur):
+    return f"{valeur:,.2f} XOF".replace(",", " ")
+
+def rendre_pdf(analyse: dict, start_date: str, end_date: str) -> bytes:
+    """Met en page le compte de résultat de la période et retourne le PDF."""
+    from weasyprint import HTML
+
+    def lignes(produits, cle, format_valeur):
+        return "".join(
+            f"<tr><td>{html.escape(p['nom'])}</td><td class='n'>{format_valeur(p[cle])}</td></tr>" for p in produits
+        )
+
+    document = f"""
+    <html><head><meta charset="utf-8"><style>
+        body {{ font-family: sans-serif; font-size: 11pt; }}
+        table {{ border-collapse: collapse; width: 100%; margin-bottom: 1.5em; }}
+        td, th {{ border-bottom: 1px solid #ccc; padding: 4px; text-align: left; }}
+        .n {{ text-align: right; }}
+    </style></head><body>
+        <h1>Compte de résultat</h1>
+        <p>Période du {start_date} au {end_date}</p>
+        <table>
+            <tr><td>Chiffre d'affaires</td><td class="n">{_montant(analyse['chiffre_affaires'])}</td></tr>
+            <tr><td>Coût des marchandises vendues</td><td class="n">{_montant(analyse['cogs'])}</td></tr>
+            <tr><th>Bénéfice brut</th><th class="n">{_montant(analyse['benefice'])}</th></tr>
+            <tr><td>Frais annexes</td><td class="n">{_montant(analyse['depenses'])}</td></tr>
+            <tr><th>Bénéfice net</th><th class="n">{_montant(analyse['benefice_net'])}</th></tr>
+        </table>
+        <h2>Produits les plus rentables</h2>
+        <table>{lignes(analyse['top_profitable_products'], 'total_profit', _montant)}</table>
+        <h2>Produits les plus perdus</h2>
+        <table>{lignes(analyse['top_lost_products'], 'total_lost', str)}</table>
+        <h2>Chiffre d'affaires journalier</h2>
+        <table>{''.join(f"<tr><td>{j['jour']}</td><td class='n'>{_montant(j['ca_jour'])}</td></tr>" for j in analyse['graph_data'])}</table>
+    </body></html>
+    """
+    return HTML(string=document).write_pdf()
+
+# ==============================================================================
+# FILE DE TÂCHES ET CACHE DES RÉSULTATS
+# ==============================================================================
+
+# Les tâches et les PDF vivent dans la mémoire du processus qui a reçu la
+# demande : le suivi (GET /api/rapports/{id}) et le téléchargement doivent
+# arriver au même processus, sinon ils répondent 404. L'API des rapports
+# suppose donc un seul worker HTTP (uvicorn sans --workers, ou un répartiteur
+# qui renvoie un même client vers le même worker).
+
+@dataclass
+class Tache:
+    id: str
+    start_date: date
+    end_date: date
+    cle: tuple
+    statut: str = "en_attente"  # en_attente | en_cours | termine | erreur
+    erreur: str = None
+    creee_le: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+
+_taches = OrderedDict()
+_pdfs = OrderedDict()
+_futures = {}
+_verrou = threading.RLock()
+_pool = None
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        # « spawn » et non fork : le processus parent fait tourner des threads
+        # (pool anyio, hachage, diffusion SSE) dont un verrou pris au moment du
+        # fork resterait pris à jamais dans l'enfant.
+        _pool = ProcessPoolExecutor(max_workers=REPORT_MAX_RENDERS, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+def arreter():
+    """Arrête le pool de rendu (à l'arrêt de l'application)."""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+def cle_rapport(start_date: date, end_date: date, analyse: dict):
+    """Clé de cache : la période et une empreinte des données analysées (leur version)."""
+    empreinte = hashlib.sha256(json.dumps(analyse, sort_keys=True, default=str).encode()).hexdigest()
+    return (start_date, end_date, empreinte)
+
+def soumettre(start_date: date, end_date: date, analyse: dict) -> Tache:
+    """
+    Crée une tâche de rapport. Si un PDF existe déjà pour la même période et les
+    mêmes données, la tâche est immédiatement terminée ; sinon le rendu part dans
+    le pool de processus. Lève RuntimeError si trop de rendus sont en attente.
+    """
+    cle = cle_rapport(start_date, end_date, analyse)
+    tache = Tache(id=uuid.uuid4().hex, start_date=start_date, end_date=end_date, cle=cle)
+    with _verrou:
+        if cle in _pdfs:
+            _pdfs.move_to_end(cle)
+            tache.statut = "termine"
+        elif cle in _futures:
+            # Un rendu identique est déjà en cours : la tâche le partage.
+            _futures[cle][1].append(tache)
+        else:
+            if len(_futures) >= REPORT_MAX_PENDING:
+                raise RuntimeError("Trop de rapports en cours de génération, réessayez plus tard.")
+            future = _get_pool().submit(rendre_pdf, analyse, start_date.isoformat(), end_date.isoformat())
+            _futures[cle] = (future, [tache])
+            future.add_done_callback(lambda f, cle=cle: _termine(cle, f))
+        _taches[tache.id] = tache
+        while len(_taches) > REPORT_MAX_JOBS:
+            _taches.popitem(last=False)
+    return tache
+
+def _termine(cle, future):
+    with _verrou:
+        _, taches = _futures.pop(cle)
+        erreur = future.exception() if not future.cancelled() else RuntimeError("Rendu annulé.")
+        if erreur is None:
+            _pdfs[cle] = future.result()
+            while len(_pdfs) > REPORT_CACHE_MAXSIZE:
+                _pdfs.popitem(last=False)
+        for tache in taches:
+            tache.statut = "termine" if erreur is None else "erreur"
+            tache.erreur = None if erreur is None else str(erreur)
+
+def get_tache(tache_id: str):
+    """Retourne la tâche (statut à jour) ou None si elle est inconnue."""
+    with _verrou:
+        tache = _taches.get(tache_id)
+        if tache is not None and tache.statut == "en_attente" and tache.cle in _futures and _futures[tache.cle][0].running():
+            tache.statut = "en_cours"
+        return tache
+
+def get_pdf(tache: Tache):
+    """PDF d'une tâche terminée, ou None s'il n'est pas (ou plus) disponible."""
+    with _verrou:
+        return _pdfs.get(tache.cle)
@@ -0,0 +1,205 @@
+import logging
+import math
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from sqlalchemy import event
+from sqlalchemy.orm import sessionmaker
+from . import database as db
+
+logger = logging.getLogger(__name__)
+
+# ==============================================================================
+# CONFIGURATION
+# ==============================================================================
+
+# Base en lecture seule (optionnelle) pour les listes, l'analyse et le tableau de
+# bord. Sans elle, toutes les lectures vont sur la base principale.
+READ_DATABASE_URL = os.getenv("READ_DATABASE_URL")
+# Après une écriture, les lectures de l'utilisateur restent sur la base principale
+# pendant ce délai (à régler au-delà du retard de réplication).
+READ_STICKY_SECONDS = float(os.getenv("READ_STICKY_SECONDS", "5"))
+# SQLite : intervalle entre deux copies de la base principale vers la réplique.
+REPLICA_SNAPSHOT_SECONDS = float(os.getenv("REPLICA_SNAPSHOT_SECONDS", "10"))
+
+read_engine = db.creer_engine(READ_DATABASE_URL, lecture_seule=True) if READ_DATABASE_URL else None
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
+# ==============================================================================
+# LECTURE DE SES PROPRES ÉCRITURES
+# ==============================================================================
+
+# Nom d'utilisateur -> instant (time.time) de sa dernière écriture validée, dans
+# l'ordre des écritures : les plus anciennes, déjà visibles sur la réplique, sont
+# retirées en tête à chaque nouvelle écriture.
+_dernieres_ecritures = OrderedDict()
+_verrou = threading.Lock()
+
+# Cookie qui porte l'instant de la dernière écriture du client : la lecture qui
+# suit une écriture peut arriver à un autre worker, qui ne l'a pas vue passer.
+# Le falsifier ne fait que renvoyer son auteur vers la base principale.
+COOKIE_ECRITURE = "derniere_ecriture"
+
+@event.listens_for(db.SessionLocal, "after_commit")
+def _noter_ecriture(session):
+    """
+    Les sessions ouvertes pour une requête HTTP portent l'état de la requête dans
+    `session.info` ; l'authentification y a déposé le nom de l'utilisateur.
+    L'instant est aussi déposé dans l'état de la requête, pour le cookie de la
+    réponse (voir DerniereEcritureMiddleware).
+    """
+    etat = session.info.get("etat_requete")
+    username = getattr(etat, "username", None)
+    if username is None or read_engine is None:
+        return
+    instant = time.time()
+    etat.derniere_ecriture = instant
+    with _verrou:
+        _dernieres_ecritures[username] = instant
+        _dernieres_ecritures.move_to_end(username)
+        while _dernieres_ecritures and _deja_repliquee(next(iter(_dernieres_ecritures.values()))):
+            _dernieres_ecritures.popitem(last=False)
+
+def _deja_repliquee(ecriture: float) -> bool:
+    """Vrai si une écriture faite à l'instant `ecriture` est visible sur la réplique."""
+    if _copie_sqlite():
+        # La réplique contient l'écriture dès qu'une copie a démarré après elle.
+        return _debut_derniere_copie is not None and ecriture < _debut_derniere_copie
+    return time.time() - ecriture >= READ_STICKY_SECONDS
+
+def duree_collante() -> float:
+    """Durée (en secondes) pendant laquelle une écriture garde son auteur sur la base principale."""
+    # Une copie SQLite démarre au plus REPLICA_SNAPSHOT_SECONDS après l'écriture.
+    return 2 * REPLICA_SNAPSHOT_SECONDS if _copie_sqlite() else READ_STICKY_SECONDS
+
+def lecture_sur_primaire(username: str = None, derniere_ecriture: float = None) -> bool:
+    """
+    Vrai si les lectures de `username` doivent encore voir la base principale.
+    `derniere_ecriture` est l'instant lu dans le cookie du client, s'il en a un.
+    """
+    if read_engine is None:
+        return True
+    if _copie_sqlite() and _debut_derniere_copie is None:
+        return True  # La réplique n'a pas encore été copiée.
+    with _verrou:
+        ecriture = max(filter(None, (_dernieres_ecritures.get(username), derniere_ecriture)), default=None)
+    return ecriture is not None and not _deja_repliquee(ecriture)
+
+class DerniereEcritureMiddleware:
+    """
+    Ajoute le cookie COOKIE_ECRITURE aux réponses des requêtes qui ont écrit en
+    base, pour que les lectures suivantes du client restent sur la base
+    principale quel que soit le worker qui les reçoit.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or read_engine is None:
+            await self.app(scope, receive, send)
+            return
+
+        async def envoyer(message):
+            instant = scope.get("state", {}).get("derniere_ecriture")
+            if message["type"] == "http.response.start" and instant is not None:
+                cookie = f"{COOKIE_ECRITURE}={instant:.3f}; Max-Age={math.ceil(duree_collante())}; Path=/api; HttpOnly; SameSite=Strict"
+                message.setdefault("headers", []).append((b"set-cookie", cookie.encode()))
+            await send(message)
+
+        await self.app(scope, receive, envoyer)
+
+def instant_du_cookie(valeur: str = None):
+    """Instant d'écriture porté par le cookie, ou None s'il est absent ou invalide."""
+    try:
+        return float(valeur) if valeur else None
+    except ValueError:
+        return None
+
+@contextmanager
+def get_read_db(username: str = None, derniere_ecriture: float = None):
+    """Session de lecture : la réplique, sauf si `username` vient d'écrire."""
+    if lecture_sur_primaire(username, derniere_ecriture):
+        with db.get_db() as session:
+            yield session
+        return
+    session = ReadSessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+def sur_replique(session) -> bool:
+    return read_engine is not None and session.get_bind() is read_engine
+
+# ==============================================================================
+# RÉPLIQUE SQLITE PAR COPIE PÉRIODIQUE
+# ==============================================================================
+
+_debut_derniere_copie = None
+_arret = threading.Event()
+_thread = None
+
+def _copie_sqlite() -> bool:
+    """Vrai si la réplique est une copie locale d'une base principale SQLite."""
+    return (
+        read_engine is not None
+        and read_engine.url.get_backend_name() == "sqlite"
+        and db.engine.url.get_backend_name() == "sqlite"
+    )
+
+def copier_base():
+    """
+    Copie la base principale vers la réplique avec l'API de sauvegarde de SQLite
+    (instantané cohérent, sans bloquer les écritures en mode WAL). La copie est
+    écrite à côté puis renommée : les lecteurs ne voient jamais un fichier partiel.
+    """
+    global _debut_derniere_copie
+    chemin = os.path.abspath(read_engine.url.database)
+    debut = time.time()
+    fd, temporaire = tempfile.mkstemp(dir=os.path.dirname(chemin), suffix=".copie")
+    os.close(fd)
+    try:
+        source = db.engine.raw_connection()
+        destination = sqlite3.connect(temporaire)
+        try:
+            source.driver_connection.backup(destination)
+            # La réplique est ouverte en lecture seule : pas de fichiers -wal/-shm.
+            destination.execute("PRAGMA journal_mode=DELETE")
+        finally:
+            destination.close()
+            source.close()
+        os.replace(temporaire, chemin)
+    except BaseException:
+        os.remove(temporaire)
+        raise
+    # Les connexions ouvertes sur l'ancien fichier sont fermées à leur restitution.
+    read_engine.dispose()
+    _debut_derniere_copie = debut
+
+def _boucle_copie():
+    while not _arret.wait(REPLICA_SNAPSHOT_SECONDS):
+        try:
+            copier_base()
+        except Exception:
+            logger.exception("Échec de la copie de la base vers la réplique")
+
+def demarrer():
+    """Au démarrage : première copie puis copie périodique, si la réplique est une copie SQLite."""
+    global _thread
+    if not _copie_sqlite() or _thread is not None:
+        return
+    copier_base()
+    _arret.clear()
+    _thread = threading.Thread(target=_boucle_copie, name="replique-sqlite", daemon=True)
+    _thread.start()
+
+def arreter():
+    global _thread
+    if _thread is not None:
+        _arret.set()
+        _thread.join()
+        _thread = None
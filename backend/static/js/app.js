@@ -90,6 +90,11 @@ document.addEventListener('DOMContentLoaded', () => {
     const navLinks = document.querySelectorAll('#sidebar .nav-link');
 
     let authToken = null;
+    let evenements = null;
+    let rechargementDiffere = null;
+    // Lignes chargées par liste paginée (toutes les pages affichées), où les
+    // boutons de modification retrouvent la ligne à modifier.
+    const lignesChargees = { ventes: [], pertes: [], frais: [] };
 
     // --- UTILS --- 
     const showToast = (message, type = 'success') => {
@@ -133,9 +138,38 @@ document.addEventListener('DOMContentLoaded', () => {
 
     function handleLogout() {
         authToken = null;
+        fermerEvenements();
         showLogin();
     }
 
+    // --- MISES À JOUR EN DIRECT (Server-Sent Events) ---
+    // Le tableau de bord et le stock affichés sont rechargés (au plus toutes
+    // les 2 secondes) quand une vente, une perte ou un produit change.
+    function ouvrirEvenements() {
+        fermerEvenements();
+        evenements = new EventSource(`/api/events?token=${encodeURIComponent(authToken)}`);
+        ['stock', 'ventes', 'produit'].forEach(type => evenements.addEventListener(type, programmerRechargement));
+    }
+
+    function fermerEvenements() {
+        if (evenements) {
+            evenements.close();
+            evenements = null;
+        }
+    }
+
+    function programmerRechargement() {
+        const ongletActif = document.querySelector('#sidebar .nav-link.active');
+        const onglet = ongletActif ? ongletActif.dataset.tab : null;
+        if ((onglet !== 'dashboard' && onglet !== 'stock') || rechargementDiffere) {
+            return;
+        }
+        rechargementDiffere = setTimeout(() => {
+            rechargementDiffere = null;
+            loadTabContent(onglet);
+        }, 2000);
+    }
+
     function showLogin() {
         loginScreen.style.display = 'block';
         appContent.style.display = 'none';
@@ -148,6 +182,7 @@ document.addEventListener('DOMContentLoaded', () => {
         const firstLink = document.querySelector('#sidebar .nav-link[data-tab="dashboard"]');
         firstLink.classList.add('active');
         loadTabContent('dashboard');
+        ouvrirEvenements();
     }
 
     async function secureFetch(url, options = {}) {
@@ -184,6 +219,20 @@ document.addEventListener('DOMContentLoaded', () => {
 
     // --- TAB RENDERERS ---
 
+    // Ajoute une page d'une liste paginée au tableau, et le bouton « Charger plus »
+    // qui demande la suivante tant qu'il en reste.
+    function afficherPage(type, page, tableBody, rendreLigne, premiere = false) {
+        if (premiere) lignesChargees[type] = [];
+        lignesChargees[type].push(...page.items);
+        page.items.forEach(item => { tableBody.insertRow().innerHTML = rendreLigne(item); });
+        const bouton = document.getElementById(`${type}-charger-plus`);
+        bouton.style.display = page.next_cursor ? '' : 'none';
+        bouton.onclick = async () => {
+            const suivante = await secureFetch(`/api/${type}?cursor=${encodeURIComponent(page.next_cursor)}`).then(res => res.json());
+            afficherPage(type, suivante, tableBody, rendreLigne);
+        };
+    }
+
     async function loadDashboardTab() {
         const kpis = await secureFetch('/api/dashboard').then(res => res.json());
         const topVentesHtml = kpis.top_ventes_today.map(item => `<li class="list-group-item d-flex justify-content-between align-items-center">${item.nom} <span class="badge bg-primary rounded-pill">${item.quantite_vendue}</span></li>`).join('') || "<p class='list-group-item text-muted'>Aucune vente aujourd'hui.</p>";
@@ -233,7 +282,7 @@ document.addEventListener('DOMContentLoaded', () => {
     }
 
     async function loadVentesTab() {
-        const [produits, ventes] = await Promise.all([
+        const [produits, page] = await Promise.all([
             secureFetch('/api/produits').then(res => res.json()),
             secureFetch('/api/ventes').then(res => res.json())
         ]);
@@ -247,14 +296,12 @@ document.addEventListener('DOMContentLoaded', () => {
                 <div class="col-md-2 d-flex align-items-end"><button type="submit" class="btn btn-primary w-100">Enregistrer</button></div>
             </div></form></div></div>
             <div class="d-flex justify-content-between align-items-center"><h2 class="h3">Historique des Ventes</h2><input type="text" id="ventes-search" class="form-control form-control-sm mx-3" placeholder="Rechercher..."><div class="btn-group"><button type="button" class="btn btn-sm btn-outline-secondary dropdown-toggle" data-bs-toggle="dropdown"><i class="bi bi-download"></i> Export</button><ul class="dropdown-menu dropdown-menu-end"><li><a class="dropdown-item export-btn" href="#" data-type="ventes" data-format="excel">Excel</a></li><li><a class="dropdown-item export-btn" href="#" data-type="ventes" data-format="pdf">PDF</a></li></ul></div></div>
-            <div class="table-responsive"><table class="table table-striped table-sm" id="ventes-table"><thead><tr><th>Produit</th><th>Quantité</th><th>Prix Total</th><th>Date</th><th>Actions</th></tr></thead><tbody></tbody></table></div>`;
+            <div class="table-responsive"><table class="table table-striped table-sm" id="ventes-table"><thead><tr><th>Produit</th><th>Quantité</th><th>Prix Total</th><th>Date</th><th>Actions</th></tr></thead><tbody></tbody></table></div>
+            <div class="text-center mb-3"><button type="button" class="btn btn-outline-secondary" id="ventes-charger-plus" style="display: none;">Charger plus</button></div>`;
 
         const tableBody = document.querySelector('#ventes-table tbody');
         tableBody.innerHTML = '';
-        ventes.forEach(v => {
-            const row = tableBody.insertRow();
-            row.innerHTML = `<td>${v.produit.nom}</td><td>${v.quantite}</td><td>${v.prix_total.toFixed(2)} XOF</td><td>${new Date(v.date).toLocaleString('fr-FR')}</td><td><button class="btn btn-sm btn-warning edit-vente-btn" data-id="${v.id}"><i class="bi bi-pencil-square"></i></button> <button class="btn btn-sm btn-danger delete-vente-btn" data-id="${v.id}"><i class="bi bi-trash"></i></button></td>`;
-        });
+        afficherPage('ventes', page, tableBody, v => `<td>${v.produit.nom}</td><td>${v.quantite}</td><td>${v.prix_total.toFixed(2)} XOF</td><td>${new Date(v.date).toLocaleString('fr-FR')}</td><td><button class="btn btn-sm btn-warning edit-vente-btn" data-id="${v.id}"><i class="bi bi-pencil-square"></i></button> <button class="btn btn-sm btn-danger delete-vente-btn" data-id="${v.id}"><i class="bi bi-trash"></i></button></td>`, true);
 
         document.getElementById('ventes-search').addEventListener('keyup', (e) => {
             const searchTerm = e.target.value.toLowerCase();
@@ -265,7 +312,7 @@ document.addEventListener('DOMContentLoaded', () => {
     }
 
     async function loadPertesTab() {
-        const [produits, pertes] = await Promise.all([
+        const [produits, page] = await Promise.all([
             secureFetch('/api/produits').then(res => res.json()),
             secureFetch('/api/pertes').then(res => res.json())
         ]);
@@ -279,14 +326,12 @@ document.addEventListener('DOMContentLoaded', () => {
                 <div class="col-md-2 d-flex align-items-end"><button type="submit" class="btn btn-danger w-100">Enregistrer</button></div>
             </div></form></div></div>
             <div class="d-flex justify-content-between align-items-center"><h2 class="h3">Historique des Pertes</h2><input type="text" id="pertes-search" class="form-control form-control-sm mx-3" placeholder="Rechercher..."><div class="btn-group"><button type="button" class="btn btn-sm btn-outline-secondary dropdown-toggle" data-bs-toggle="dropdown"><i class="bi bi-download"></i> Export</button><ul class="dropdown-menu dropdown-menu-end"><li><a class="dropdown-item export-btn" href="#" data-type="pertes" data-format="excel">Excel</a></li><li><a class="dropdown-item export-btn" href="#" data-type="pertes" data-format="pdf">PDF</a></li></ul></div></div>
-            <div class="table-responsive"><table class="table table-striped table-sm" id="pertes-table"><thead><tr><th>Produit</th><th>Quantité</th><th>Date</th><th>Actions</th></tr></thead><tbody></tbody></table></div>`;
+            <div class="table-responsive"><table class="table table-striped table-sm" id="pertes-table"><thead><tr><th>Produit</th><th>Quantité</th><th>Date</th><th>Actions</th></tr></thead><tbody></tbody></table></div>
+            <div class="text-center mb-3"><button type="button" class="btn btn-outline-secondary" id="pertes-charger-plus" style="display: none;">Charger plus</button></div>`;
 
         const tableBody = document.querySelector('#pertes-table tbody');
         tableBody.innerHTML = '';
-        pertes.forEach(p => {
-            const row = tableBody.insertRow();
-            row.innerHTML = `<td>${p.produit.nom}</td><td>${p.quantite}</td><td>${new Date(p.date).toLocaleString('fr-FR')}</td><td><button class="btn btn-sm btn-warning edit-perte-btn" data-id="${p.id}"><i class="bi bi-pencil-square"></i></button> <button class="btn btn-sm btn-danger delete-perte-btn" data-id="${p.id}"><i class="bi bi-trash"></i></button></td>`;
-        });
+        afficherPage('pertes', page, tableBody, p => `<td>${p.produit.nom}</td><td>${p.quantite}</td><td>${new Date(p.date).toLocaleString('fr-FR')}</td><td><button class="btn btn-sm btn-warning edit-perte-btn" data-id="${p.id}"><i class="bi bi-pencil-square"></i></button> <button class="btn btn-sm btn-danger delete-perte-btn" data-id="${p.id}"><i class="bi bi-trash"></i></button></td>`, true);
 
         document.getElementById('pertes-search').addEventListener('keyup', (e) => {
             const searchTerm = e.target.value.toLowerCase();
@@ -368,7 +413,7 @@ document.addEventListener('DOMContentLoaded', () => {
     }
 
     async function loadFraisTab() {
-        const [produits, frais] = await Promise.all([
+        const [produits, page] = await Promise.all([
             secureFetch('/api/produits').then(res => res.json()),
             secureFetch('/api/frais').then(res => res.json())
         ]);
@@ -383,14 +428,12 @@ document.addEventListener('DOMContentLoaded', () => {
                 <div class="col-md-1 d-flex align-items-end"><button type="submit" class="btn btn-primary w-100">Ajouter</button></div>
             </div></form></div></div>
             <h2 class="h3">Liste des Frais</h2>
-            <div class="table-responsive"><table class="table table-striped table-sm" id="frais-table"><thead><tr><th>Produit</th><th>Description</th><th>Montant</th><th>Date</th><th>Actions</th></tr></thead><tbody></tbody></table></div>`;
+            <div class="table-responsive"><table class="table table-striped table-sm" id="frais-table"><thead><tr><th>Produit</th><th>Description</th><th>Montant</th><th>Date</th><th>Actions</th></tr></thead><tbody></tbody></table></div>
+            <div class="text-center mb-3"><button type="button" class="btn btn-outline-secondary" id="frais-charger-plus" style="display: none;">Charger plus</button></div>`;
 
         const tableBody = document.querySelector('#frais-table tbody');
         tableBody.innerHTML = '';
-        frais.forEach(f => {
-            const row = tableBody.insertRow();
-            row.innerHTML = `<td>${f.produit.nom}</td><td>${f.description}</td><td>${f.montant.toFixed(2)} XOF</td><td>${new Date(f.date).toLocaleString('fr-FR')}</td><td><button class="btn btn-sm btn-warning edit-frais-btn" data-id="${f.id}"><i class="bi bi-pencil-square"></i></button> <button class="btn btn-sm btn-danger delete-frais-btn" data-id="${f.id}"><i class="bi bi-trash"></i></button></td>`;
-        });
+        afficherPage('frais', page, tableBody, f => `<td>${f.produit.nom}</td><td>${f.description}</td><td>${f.montant.toFixed(2)} XOF</td><td>${new Date(f.date).toLocaleString('fr-FR')}</td><td><button class="btn btn-sm btn-warning edit-frais-btn" data-id="${f.id}"><i class="bi bi-pencil-square"></i></button> <button class="btn btn-sm btn-danger delete-frais-btn" data-id="${f.id}"><i class="bi bi-trash"></i></button></td>`, true);
     }
 
     // --- MODAL LOGIC ---
@@ -550,21 +593,15 @@ document.addEventListener('DOMContentLoaded', () => {
 
         if (targetClosest('.edit-vente-btn')) {
             const id = targetClosest('.edit-vente-btn').dataset.id;
-            const [ventes, produits] = await Promise.all([
-                secureFetch('/api/ventes').then(res => res.json()),
-                secureFetch('/api/produits').then(res => res.json())
-            ]);
-            const vente = ventes.find(v => v.id == id);
+            const produits = await secureFetch('/api/produits').then(res => res.json());
+            const vente = lignesChargees.ventes.find(v => v.id == id);
             openVenteModal(vente, produits);
         }
 
         if (targetClosest('.edit-perte-btn')) {
             const id = targetClosest('.edit-perte-btn').dataset.id;
-            const [pertes, produits] = await Promise.all([
-                secureFetch('/api/pertes').then(res => res.json()),
-                secureFetch('/api/produits').then(res => res.json())
-            ]);
-            const perte = pertes.find(p => p.id == id);
+            const produits = await secureFetch('/api/produits').then(res => res.json());
+            const perte = lignesChargees.pertes.find(p => p.id == id);
             openPerteModal(perte, produits);
         }
 
@@ -586,11 +623,8 @@ document.addEventListener('DOMContentLoaded', () => {
 
         if (targetClosest('.edit-frais-btn')) {
             const id = targetClosest('.edit-frais-btn').dataset.id;
-            const [frais, produits] = await Promise.all([
-                secureFetch('/api/frais').then(res => res.json()),
-                secureFetch('/api/produits').then(res => res.json())
-            ]);
-            const fraisItem = frais.find(f => f.id == id);
+            const produits = await secureFetch('/api/produits').then(res => res.json());
+            const fraisItem = lignesChargees.frais.find(f => f.id == id);
             openFraisModal(fraisItem, produits);
         }
 
@@ -0,0 +1,110 @@
+import gzip
+import mimetypes
+import os
+import re
+import stat
+from pathlib import Path
+import anyio.to_thread
+from starlette.datastructures import Headers
+from starlette.responses import Response
+from starlette.staticfiles import StaticFiles
+
+# ==============================================================================
+# CONFIGURATION
+# ==============================================================================
+
+# Compression à la volée des réponses de l'API (GZipMiddleware) : taille minimale
+# d'une réponse compressée et niveau de compression (1 rapide - 9 compact).
+GZIP_MINIMUM_SIZE = int(os.getenv("GZIP_MINIMUM_SIZE", "1000"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+
+# Fichiers de frontend/build compressés d'avance par `manage.py precompress`.
+EXTENSIONS_COMPRESSIBLES = (".js", ".css", ".html", ".json", ".svg", ".map", ".txt", ".ico")
+
+# Encodages servis depuis un fichier précompressé, par ordre de préférence.
+ENCODAGES = (("br", ".br"), ("gzip", ".gz"))
+
+# Noms de fichiers du build CRA contenant un hash du contenu (main.1a2b3c4d.js,
+# 453.9f8e7d6c.chunk.js, logo.6ce24c58.svg) : leur contenu ne change jamais.
+NOM_AVEC_HASH = re.compile(r"\.[0-9a-f]{8,}\.")
+
+CACHE_IMMUABLE = "public, max-age=31536000, immutable"
+CACHE_REVALIDATION = "no-cache"
+
+# ==============================================================================
+# FICHIERS STATIQUES PRÉCOMPRESSÉS
+# ==============================================================================
+
+def encodages_acceptes(scope) -> set:
+    """Encodages de l'en-tête Accept-Encoding, sauf ceux refusés par q=0."""
+    acceptes = set()
+    for element in Headers(scope=scope).get("accept-encoding", "").split(","):
+        encodage, *parametres = [partie.strip() for partie in element.split(";")]
+        qualite = next((parametre[2:] for parametre in parametres if parametre.startswith("q=")), "1")
+        try:
+            if float(qualite) > 0:
+                acceptes.add(encodage.lower())
+        except ValueError:
+            pass
+    return acceptes
+
+class StaticFilesPrecompresses(StaticFiles):
+    """
+    StaticFiles qui sert `fichier.br` ou `fichier.gz` à la place de `fichier`
+    quand ils existent et que le client les accepte : aucune compression à
+    chaque requête. Les fichiers dont le nom contient un hash sont marqués
+    immuables ; les autres (index.html) sont revalidés à chaque chargement
+    (ETag / Last-Modified, réponse 304 s'ils n'ont pas changé).
+    """
+
+    async def get_response(self, path: str, scope) -> Response:
+        acceptes = encodages_acceptes(scope)
+        for encodage, extension in ENCODAGES:
+            if encodage not in acceptes:
+                continue
+            chemin, stat_result = await anyio.to_thread.run_sync(self.lookup_path, path + extension)
+            if stat_result is None or not stat.S_ISREG(stat_result.st_mode):
+                continue
+            response = self.file_response(chemin, stat_result, scope)
+            if response.status_code == 200:
+                response.headers["content-encoding"] = encodage
+                media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+                # Même Content-Type que le fichier non compressé (FileResponse).
+                response.headers["content-type"] = f"{media_type}; charset=utf-8" if media_type.startswith("text/") else media_type
+            break
+        else:
+            response = await super().get_response(path, scope)
+        response.headers["vary"] = "Accept-Encoding"
+        response.headers["cache-control"] = CACHE_IMMUABLE if NOM_AVEC_HASH.search(Path(path).name) else CACHE_REVALIDATION
+        return response
+
+def precompresser(dossier: Path) -> dict:
+    """
+    Écrit à côté de chaque fichier compressible de `dossier` sa version .gz et,
+    si le module `brotli` est installé, sa version .br. Une version compressée
+    plus grande que l'original n'est pas gardée. Retourne les tailles totales.
+    """
+    try:
+        import brotli
+    except ImportError:
+        brotli = None
+
+    totaux = {"fichiers": 0, "original": 0, "gzip": 0, "br": 0}
+    for chemin in sorted(dossier.rglob("*")):
+        if not chemin.is_file() or chemin.suffix not in EXTENSIONS_COMPRESSIBLES:
+            continue
+        contenu = chemin.read_bytes()
+        totaux["fichiers"] += 1
+        totaux["original"] += len(contenu)
+        versions = {".gz": ("gzip", gzip.compress(contenu, compresslevel=9, mtime=0))}
+        if brotli is not None:
+            versions[".br"] = ("br", brotli.compress(contenu, quality=11))
+        for extension, (encodage, compresse) in versions.items():
+            cible = chemin.with_name(chemin.name + extension)
+            if len(compresse) < len(contenu):
+                cible.write_bytes(compresse)
+                totaux[encodage] += len(compresse)
+            else:
+                cible.unlink(missing_ok=True)
+                totaux[encodage] += len(contenu)
+    return totaux
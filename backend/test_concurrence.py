@@ -0,0 +1,54 @@
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from sqlalchemy import func
+
+STOCK_INITIAL = 300
+THREADS = 16
+OPERATIONS_PAR_THREAD = 150
+
+
+@pytest.fixture(scope="module")
+def produits(base_vide):
+    db = base_vide
+    with db.get_db() as session:
+        return [db.add_produit(session, f"Produit stress {i}", 10, 20, STOCK_INITIAL).id for i in range(2)]
+
+
+def test_ventes_concurrentes_sans_survente(base_vide, produits):
+    db = base_vide
+    ventes_creees = []
+    verrou = threading.Lock()
+
+    def caisse(graine):
+        rng = random.Random(graine)
+        for _ in range(OPERATIONS_PAR_THREAD):
+            produit_id = rng.choice(produits)
+            quantite = rng.randint(1, 3)
+            operation = rng.random()
+            with db.get_db() as session:
+                try:
+                    if operation < 0.7:
+                        vente = db.add_vente(session, user_id=1, produit_id=produit_id, quantite=quantite)
+                        with verrou:
+                            ventes_creees.append(vente.id)
+                    elif operation < 0.85:
+                        db.add_perte(session, user_id=1, produit_id=produit_id, quantite=quantite)
+                    elif ventes_creees:
+                        db.update_vente(session, rng.choice(ventes_creees), produit_id=produit_id, quantite=quantite)
+                except ValueError:
+                    pass  # Stock insuffisant : refus attendu une fois le stock épuisé.
+
+    with ThreadPoolExecutor(max_workers=THREADS) as pool:
+        list(pool.map(caisse, range(THREADS)))
+
+    with db.get_db() as session:
+        for produit_id in produits:
+            stock = session.query(db.Produit.quantite).filter(db.Produit.id == produit_id).scalar()
+            vendu = session.query(func.coalesce(func.sum(db.Vente.quantite), 0)).filter(db.Vente.produit_id == produit_id).scalar()
+            perdu = session.query(func.coalesce(func.sum(db.Perte.quantite), 0)).filter(db.Perte.produit_id == produit_id).scalar()
+            assert stock >= 0
+            assert stock == STOCK_INITIAL - vendu - perdu
+        assert db.check_daily_stats(session) == []
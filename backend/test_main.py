@@ -1,27 +1,35 @@
+import asyncio
+import base64
+import csv
+import io
+import json
+import threading
+import time
+
 import pytest
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from typing import List
 from fastapi.testclient import TestClient
-import os
-
-# Créer le répertoire static s'il n'existe pas
-if not os.path.exists('static'):
-    os.makedirs('static')
+from jose import jwt
+from sqlalchemy import event
 
-from main import app
+from backend import cache, database, evenements, passwords, replique, statique
+from backend.main import app
 
 @pytest.fixture(scope="module")
-def client():
-    from database import Base, engine
-    Base.metadata.drop_all(bind=engine)
-    Base.metadata.create_all(bind=engine)
+def client(base_vide):
     return TestClient(app)
 
 def test_full_workflow(client: TestClient):
     # 1. Connexion
     login_data = {"username": "admin", "password": "Dakar2026@"}
-    response = client.post("/token", data=login_data)
+    response = client.post("/api/token", data=login_data)
     assert response.status_code == 200
     token = response.json()["access_token"]
     headers = {"Authorization": f"Bearer {token}"}
+    # Les rôles sont lus en base (cache des principals), jamais dans le token.
+    assert set(jwt.get_unverified_claims(token)) == {"sub", "exp"}
 
     # 2. Création des produits
     p1_res = client.post("/api/produits", headers=headers, json={"nom": "Produit A", "prix_achat": 10, "prix_vente": 20, "quantite": 100})
@@ -70,10 +78,10 @@ def test_full_workflow(client: TestClient):
     # 6. Suppression
     # Suppression de la vente modifiée
     res = client.delete(f"/api/ventes/{vente1_updated['id']}", headers=headers)
-    assert res.status_code == 200
+    assert res.status_code == 204
     # Suppression de la perte modifiée
     res = client.delete(f"/api/pertes/{perte1_updated['id']}", headers=headers)
-    assert res.status_code == 200
+    assert res.status_code == 204
 
     # 7. Vérification finale des stocks après suppression
     produits_res = client.get("/api/produits", headers=headers)
@@ -83,4 +91,873 @@ def test_full_workflow(client: TestClient):
     assert p1_final_2["quantite"] == 100 # Stock restauré
     assert p2_final_2["quantite"] == 100 # Stock restauré
 
-    print("\n>>> All workflow tests passed successfully.")
\ No newline at end of file
+    print("\n>>> All workflow tests passed successfully.")
+
+
+def test_produits_requete_conditionnelle(client: TestClient):
+    token = client.post("/api/token", data={"username": "admin", "password": "Dakar2026@"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    premiere = client.get("/api/produits", headers=headers)
+    etag = premiere.headers["etag"]
+    # Version inchangée : 304 sans corps.
+    res = client.get("/api/produits", headers={**headers, "If-None-Match": etag})
+    assert res.status_code == 304
+    assert res.content == b""
+
+    # Une vente modifie le stock : la liste change de version, dans une
+    # transaction courte après son commit (la ligne de version n'est pas
+    # verrouillée pendant toute la vente).
+    produit = premiere.json()[0]
+    journal = []
+    def requete(conn, cursor, statement, *args):
+        if "versions_listes" in statement:
+            journal.append("version")
+    def commit(conn):
+        journal.append("commit")
+    event.listen(database.engine, "before_cursor_execute", requete)
+    event.listen(database.engine, "commit", commit)
+    try:
+        client.post("/api/ventes", headers=headers, json={"produit_id": produit["id"], "quantite": 1})
+    finally:
+        event.remove(database.engine, "before_cursor_execute", requete)
+        event.remove(database.engine, "commit", commit)
+    assert journal == ["commit", "version", "commit"]
+    res = client.get("/api/produits", headers={**headers, "If-None-Match": etag})
+    assert res.status_code == 200
+    assert res.headers["etag"] != etag
+    assert next(p for p in res.json() if p["id"] == produit["id"])["quantite"] == produit["quantite"] - 1
+
+    # Une écriture validée par un autre processus (autre worker, manage.py) se
+    # voit aussi : la version est lue en base.
+    etag = res.headers["etag"]
+    with database.get_db() as session:
+        database._incrementer_version(session, "produits")
+        session.commit()
+    assert client.get("/api/produits", headers={**headers, "If-None-Match": etag}).status_code == 200
+
+    # Les rôles ne changent pas par l'API : pas d'ETag, donc pas de 304 périmé.
+    assert "etag" not in client.get("/api/roles", headers=headers).headers
+
+def test_nombre_de_requetes_sql_des_ecritures(client: TestClient, base_vide):
+    # Les écritures renvoient l'état enregistré (RETURNING) : aucune relecture
+    # après le commit ; chaque mouvement de stock ajoute une écriture au registre
+    # chaque produit écrit est réindexé pour la recherche et la version de la
+    # liste modifiée (ETag) est incrémentée (après le commit pour les ventes et
+    # pertes).
+    # Les comptes dépendent du dialecte : SQLite ajoute l'UPDATE neutre qui
+    # verrouille la ligne et l'écriture de l'index FTS, PostgreSQL le SELECT ...
+    # FOR UPDATE des produits d'une vente déplacée. Un entier vaut pour les deux
+    # bases, un couple donne (SQLite, PostgreSQL).
+    token = client.post("/api/token", data={"username": "admin", "password": "Dakar2026@"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    client.get("/api/users/me", headers=headers)  # principal en cache
+
+    def ecrire(methode, url, attendu, **kwargs):
+        res = client.request(methode, url, headers=headers, **kwargs)
+        assert res.status_code in (200, 204), res.text
+        if isinstance(attendu, tuple):
+            attendu = attendu[0] if base_vide.engine.dialect.name == "sqlite" else attendu[1]
+        assert int(res.headers["x-db-queries"]) == attendu, f"{methode} {url}"
+        return res.json() if res.content else None
+
+    p1 = ecrire("POST", "/api/produits", (4, 3), json={"nom": "Compte A", "prix_achat": "1.005", "prix_vente": 2, "quantite": 100})
+    assert p1["prix_achat"] == 1.01  # montant arrondi tel qu'enregistré
+    p2 = ecrire("POST", "/api/produits", (4, 3), json={"nom": "Compte B", "prix_achat": 1, "prix_vente": 3, "quantite": 100})
+    ecrire("PUT", f"/api/produits/{p1['id']}", (4, 3), json={"nom": "Compte A", "prix_achat": 1, "prix_vente": "2.50", "quantite": 100})
+
+    vente = ecrire("POST", "/api/ventes", 5, json={"produit_id": p1["id"], "quantite": 2})
+    assert vente["prix_total"] == 5.0 and vente["produit"]["quantite"] == 98
+    vente = ecrire("PUT", f"/api/ventes/{vente['id']}", 9, json={"produit_id": p2["id"], "quantite": 3})
+    assert vente["prix_total"] == 9.0 and vente["produit"]["nom"] == "Compte B"
+    ecrire("DELETE", f"/api/ventes/{vente['id']}", (7, 6))
+
+    perte = ecrire("POST", "/api/pertes", 5, json={"produit_id": p1["id"], "quantite": 2})
+    perte = ecrire("PUT", f"/api/pertes/{perte['id']}", 9, json={"produit_id": p2["id"], "quantite": 1})
+    assert perte["produit"]["quantite"] == 99
+    ecrire("DELETE", f"/api/pertes/{perte['id']}", (7, 6))
+
+    frais = ecrire("POST", "/api/frais", 3, json={"produit_id": p1["id"], "description": "x", "montant": "1.005"})
+    frais = ecrire("PUT", f"/api/frais/{frais['id']}", 6, json={"produit_id": p2["id"], "description": "y", "montant": "2.675"})
+    assert frais["montant"] == 2.68 and frais["produit"]["nom"] == "Compte B"
+    ecrire("DELETE", f"/api/frais/{frais['id']}", (4, 3))
+
+    user = ecrire("POST", "/api/users", 5, json={"username": "compte", "email": "compte@example.com", "password": "Abcdefgh1@", "roles": ["manager"]})
+    assert [role["name"] for role in user["roles"]] == ["manager"]
+    ecrire("PUT", f"/api/users/{user['id']}", 7, json={"username": "compte2", "email": "compte@example.com", "roles": ["admin"]})
+    ecrire("DELETE", f"/api/users/{user['id']}", 5)
+
+def test_registre_des_mouvements_de_stock(client: TestClient, base_vide, monkeypatch):
+    token = client.post("/api/token", data={"username": "admin", "password": "Dakar2026@"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    produit = client.post("/api/produits", headers=headers, json={"nom": "Registre", "prix_achat": 1, "prix_vente": 2, "quantite": 50}).json()
+
+    def stock(**params):
+        res = client.get("/api/stock", headers=headers, params={"produit_id": produit["id"], **params})
+        assert res.status_code == 200
+        return res.json()[0]["quantite"]
+
+    vente = client.post("/api/ventes", headers=headers, json={"produit_id": produit["id"], "quantite": 5}).json()
+    client.put(f"/api/ventes/{vente['id']}", headers=headers, json={"produit_id": produit["id"], "quantite": 7})
+    perte = client.post("/api/pertes", headers=headers, json={"produit_id": produit["id"], "quantite": 2}).json()
+    client.delete(f"/api/pertes/{perte['id']}", headers=headers)
+    client.put(f"/api/produits/{produit['id']}", headers=headers, json={**produit, "quantite": 60})
+    assert stock() == 60
+    assert stock(date="2000-01-01") == 0
+
+    # Instantané, puis une vente hors ligne datée d'avant lui : il est retiré.
+    monkeypatch.setattr(base_vide, "STOCK_SNAPSHOT_MARGIN_S", 0)
+    with base_vide.get_db() as session:
+        base_vide.snapshot_stock(session, datetime.now(timezone.utc))
+    client.post("/api/ventes", headers=headers, json={"produit_id": produit["id"], "quantite": 1})
+    assert stock() == 59
+    hier = (datetime.now(timezone.utc) - timedelta(days=1)).isoformat()
+    client.post("/api/ventes/batch", headers=headers, json={"id_lot": "registre-1", "lignes": [{"produit_id": produit["id"], "quantite": 3, "date": hier}]})
+    assert stock() == 56
+    with base_vide.get_db() as session:
+        assert not session.query(base_vide.StockInstantane).filter_by(produit_id=produit["id"]).count()
+        assert base_vide.check_stock_ledger(session) == []
+
+def test_recherche_produits(client: TestClient, base_vide):
+    token = client.post("/api/token", data={"username": "admin", "password": "Dakar2026@"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    cafe = client.post("/api/produits", headers=headers, json={"nom": "Café moulu 250g", "prix_achat": 2, "prix_vente": "3.50", "quantite": 5}).json()
+    client.post("/api/produits", headers=headers, json={"nom": "Thé vert", "prix_achat": 1, "prix_vente": 2, "quantite": 5})
+
+    def chercher(q, **params):
+        res = client.get("/api/produits/search", headers=headers, params={"q": q, **params})
+        assert res.status_code == 200
+        return [p["nom"] for p in res.json()]
+
+    # Sans casse ni accents, sur SQLite (FTS5) comme sur PostgreSQL (unaccent).
+    assert chercher("CAFE mou") == ["Café moulu 250g"]
+    assert chercher("cafe") == ["Café moulu 250g"]
+    assert chercher("the") == ["Thé vert"]
+    if base_vide.engine.dialect.name == "sqlite":
+        # Chaque mot doit commencer un mot du nom ; PostgreSQL accepte un nom proche (trigrammes).
+        assert chercher("vert café") == []
+    else:
+        assert chercher("cafe mouluu") == ["Café moulu 250g"]
+    # L'index suit les modifications et suppressions.
+    client.put(f"/api/produits/{cafe['id']}", headers=headers, json={**cafe, "nom": "Café en grains"})
+    assert chercher("moulu") == []
+    assert chercher("grain") == ["Café en grains"]
+    client.delete(f"/api/produits/{cafe['id']}", headers=headers)
+    assert chercher("cafe") == []
+    client.post("/api/produits", headers=headers, json={"nom": "Thé noir", "prix_achat": 1, "prix_vente": 2, "quantite": 5})
+    assert sorted(chercher("the")) == ["Thé noir", "Thé vert"]
+    assert len(chercher("the", limit=1)) == 1
+
+def test_resultats_lus_sur_la_replique_hors_cache(client: TestClient, monkeypatch):
+    token = client.post("/api/token", data={"username": "admin", "password": "Dakar2026@"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    cache.resultats.invalider()
+    monkeypatch.setattr(replique, "sur_replique", lambda session: True)
+    assert client.get("/api/analyse?start_date=2020-01-01&end_date=2020-01-31", headers=headers).status_code == 200
+    assert client.get("/api/dashboard", headers=headers).status_code == 200
+    assert cache.resultats.stats()["taille"] == 0
+    monkeypatch.undo()
+    client.get("/api/dashboard", headers=headers)
+    assert cache.resultats.stats()["taille"] == 1
+
+def test_suppression_produit_apres_annulation_de_son_historique(client: TestClient, base_vide):
+    token = client.post("/api/token", data={"username": "admin", "password": "Dakar2026@"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    produit = client.post("/api/produits", headers=headers, json={"nom": "Éphémère", "prix_achat": 1, "prix_vente": 2, "quantite": 10}).json()
+    vente = client.post("/api/ventes", headers=headers, json={"produit_id": produit["id"], "quantite": 2}).json()
+    frais = client.post("/api/frais", headers=headers, json={"produit_id": produit["id"], "description": "x", "montant": 1}).json()
+    client.delete(f"/api/ventes/{vente['id']}", headers=headers)
+    client.delete(f"/api/frais/{frais['id']}", headers=headers)
+    # Il ne reste que des lignes d'agrégat à zéro : elles partent avec le produit.
+    assert client.delete(f"/api/produits/{produit['id']}", headers=headers).status_code == 204
+    with base_vide.get_db() as session:
+        assert session.query(base_vide.StatProduitJour).filter_by(produit_id=produit["id"]).count() == 0
+
+def test_lot_de_ventes_atomique_et_idempotent(client: TestClient, base_vide):
+    token = client.post("/api/token", data={"username": "admin", "password": "Dakar2026@"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    a = client.post("/api/produits", headers=headers, json={"nom": "Lot A", "prix_achat": 1, "prix_vente": 2, "quantite": 10}).json()
+    b = client.post("/api/produits", headers=headers, json={"nom": "Lot B", "prix_achat": 1, "prix_vente": 3, "quantite": 1}).json()
+
+    def etat():
+        with base_vide.get_db() as session:
+            ids = (a["id"], b["id"])
+            return (
+                [p.quantite for p in session.query(base_vide.Produit).filter(base_vide.Produit.id.in_(ids)).order_by(base_vide.Produit.id)],
+                session.query(base_vide.Vente).filter(base_vide.Vente.produit_id.in_(ids)).count(),
+                session.query(base_vide.MouvementStock).filter(base_vide.MouvementStock.produit_id.in_(ids)).count(),
+            )
+
+    # Une ligne en survente : tout le lot est annulé, stock, ventes et registre compris.
+    avant = etat()
+    lot = {"id_lot": "caisse-1-0001", "lignes": [{"produit_id": a["id"], "quantite": 2}, {"produit_id": b["id"], "quantite": 5}]}
+    res = client.post("/api/ventes/batch", headers=headers, json=lot)
+    assert res.status_code == 400 and "Lot B" in res.json()["detail"]
+    assert etat() == avant
+
+    # Une vente datée dans le futur est refusée.
+    demain = (datetime.now(timezone.utc) + timedelta(days=1)).isoformat()
+    res = client.post("/api/ventes/batch", headers=headers, json={"id_lot": "caisse-1-0002", "lignes": [{"produit_id": a["id"], "quantite": 1, "date": demain}]})
+    assert res.status_code == 400
+    assert etat() == avant
+
+    # Le lot corrigé passe ; renvoyé après un délai dépassé, il n'est pas vendu deux fois.
+    lot["lignes"][1]["quantite"] = 1
+    premier = client.post("/api/ventes/batch", headers=headers, json=lot)
+    assert premier.status_code == 200
+    rejoue = client.post("/api/ventes/batch", headers=headers, json=lot)
+    assert rejoue.status_code == 200 and rejoue.json() == premier.json()
+    assert etat() == ([8, 0], 2, avant[2] + 2)
+
+def test_migration_des_montants_en_centimes(tmp_path, monkeypatch):
+    # Base au schéma d'origine : montants en REAL, en unités.
+    moteur = database.creer_engine(f"sqlite:///{tmp_path / 'avant_centimes.db'}")
+    with moteur.begin() as conn:
+        for ddl in (
+            "CREATE TABLE users (id INTEGER PRIMARY KEY, username VARCHAR NOT NULL UNIQUE, email VARCHAR NOT NULL UNIQUE, hashed_password VARCHAR NOT NULL)",
+            "CREATE TABLE produits (id INTEGER PRIMARY KEY, nom VARCHAR NOT NULL UNIQUE, prix_achat FLOAT NOT NULL, prix_vente FLOAT NOT NULL, quantite INTEGER NOT NULL)",
+            "CREATE TABLE ventes (id INTEGER PRIMARY KEY, produit_id INTEGER NOT NULL REFERENCES produits (id), quantite INTEGER NOT NULL, "
+            "prix_total FLOAT NOT NULL, date DATETIME, user_id INTEGER REFERENCES users (id))",
+            "CREATE TABLE pertes (id INTEGER PRIMARY KEY, produit_id INTEGER NOT NULL REFERENCES produits (id), quantite INTEGER NOT NULL, "
+            "date DATETIME, user_id INTEGER REFERENCES users (id))",
+            "CREATE TABLE frais_annexes (id INTEGER PRIMARY KEY, produit_id INTEGER NOT NULL REFERENCES produits (id), description VARCHAR NOT NULL, "
+            "montant FLOAT NOT NULL, date DATETIME, user_id INTEGER REFERENCES users (id))",
+            "INSERT INTO users VALUES (1, 'caisse', 'caisse@example.com', 'x')",
+            "INSERT INTO produits VALUES (1, 'Riz', 1.005, 2.675, 10), (2, 'Huile', 19.99, 0.285, 5)",
+            "INSERT INTO ventes VALUES (1, 1, 3, 8.025, '2025-01-02 10:00:00', 1), (2, 2, 1, 0.285, '2025-01-03 10:00:00', NULL)",
+            "INSERT INTO pertes VALUES (1, 2, 1, '2025-01-04 10:00:00', 1)",
+            "INSERT INTO frais_annexes VALUES (1, 2, 'transport', 1.115, '2025-01-05 10:00:00', 1)",
+        ):
+            conn.exec_driver_sql(ddl)
+
+    # L'application refuse de démarrer tant que la migration n'a pas été faite.
+    monkeypatch.setattr(database, "engine", moteur)
+    with pytest.raises(RuntimeError, match="migrate-money"):
+        database.create_db_and_tables()
+
+    rapport = database.migrer_montants(moteur)
+    assert {table: r["lignes"] for table, r in rapport.items()} == {"produits": 2, "ventes": 2, "frais_annexes": 1}
+    assert database.colonnes_montant_a_migrer(moteur) == []
+    with moteur.connect() as conn:
+        # Centimes arrondis au plus proche, demi vers le haut, comme Montant.
+        assert conn.exec_driver_sql("SELECT id, prix_achat, prix_vente FROM produits ORDER BY id").all() == [(1, 101, 268), (2, 1999, 29)]
+        assert conn.exec_driver_sql("SELECT id, produit_id, prix_total, user_id FROM ventes ORDER BY id").all() == [(1, 1, 803, 1), (2, 2, 29, None)]
+        assert conn.exec_driver_sql("SELECT produit_id, montant FROM frais_annexes").all() == [(2, 112)]
+        # Les clés étrangères désignent toujours produits, sans ligne orpheline.
+        for table in ("ventes", "pertes", "frais_annexes"):
+            assert {fk[2] for fk in conn.exec_driver_sql(f"PRAGMA foreign_key_list({table})")} == {"produits", "users"}
+        assert conn.exec_driver_sql("PRAGMA foreign_key_check").all() == []
+
+    montant = database.Montant()
+    assert [montant.process_bind_param(v, None) for v in ("2.675", "0.005", "-0.005", 1.005, 19.99)] == [268, 1, -1, 101, 1999]
+    assert montant.process_result_value(268, None) == Decimal("2.68")
+
+def test_hachages_simultanes_bornes(monkeypatch):
+    en_cours, maximum, verrou = 0, 0, threading.Lock()
+
+    def verification_lente(mot_de_passe, hache):
+        nonlocal en_cours, maximum
+        with verrou:
+            en_cours += 1
+            maximum = max(maximum, en_cours)
+        time.sleep(0.05)
+        with verrou:
+            en_cours -= 1
+        return mot_de_passe == hache
+
+    monkeypatch.setattr(passwords.pwd_context, "verify", verification_lente)
+    termines = passwords.stats.snapshot()["termines"]
+    n = 3 * passwords.HASH_MAX_CONCURRENCY + 1
+
+    async def connexions():
+        return await asyncio.gather(*(passwords.verify_password_async("x", "x") for _ in range(n)))
+
+    # Les vérifications en surplus attendent dans la file au lieu de s'exécuter toutes à la fois.
+    assert asyncio.run(connexions()) == [True] * n
+    assert maximum == passwords.HASH_MAX_CONCURRENCY
+    etat = passwords.stats.snapshot()
+    assert etat["termines"] == termines + n and etat["en_cours"] == etat["en_attente"] == 0
+    assert etat["attente_max_ms"] > 0
+
+def test_exports_csv_et_xlsx(client: TestClient, base_vide):
+    from openpyxl import load_workbook
+    token = client.post("/api/token", data={"username": "admin", "password": "Dakar2026@"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    admin_id = client.get("/api/users/me", headers=headers).json()["id"]
+    produit = client.post("/api/produits", headers=headers, json={"nom": "Export", "prix_achat": 1, "prix_vente": "2.50", "quantite": 20}).json()
+    ventes = client.post("/api/ventes/batch", headers=headers, json={"id_lot": "export-1", "lignes": [
+        {"produit_id": produit["id"], "quantite": 3, "date": "2025-03-02T09:30:00Z"},
+        {"produit_id": produit["id"], "quantite": 1, "date": "2025-03-01T10:00:00Z"},
+        {"produit_id": produit["id"], "quantite": 2, "date": "2025-03-05T08:00:00Z"},
+    ]}).json()
+
+    # Période du 1er au 2 mars : la vente du 5 est exclue, les lignes suivent l'ordre des dates.
+    attendu = [
+        ["id", "date", "produit_id", "produit", "quantite", "prix_total", "user_id"],
+        [str(ventes[1]["id"]), "2025-03-01 10:00:00", str(produit["id"]), "Export", "1", "2.50", str(admin_id)],
+        [str(ventes[0]["id"]), "2025-03-02 09:30:00", str(produit["id"]), "Export", "3", "7.50", str(admin_id)],
+    ]
+    params = {"start_date": "2025-03-01", "end_date": "2025-03-02"}
+    res = client.get("/api/export/ventes", headers=headers, params=params)
+    assert res.status_code == 200 and res.headers["content-type"].startswith("text/csv")
+    assert 'filename="ventes_2025-03-01_2025-03-02.csv"' in res.headers["content-disposition"]
+    assert list(csv.reader(io.StringIO(res.text))) == attendu
+
+    res = client.get("/api/export/ventes", headers=headers, params={**params, "format": "xlsx"})
+    assert res.status_code == 200
+    feuille = load_workbook(io.BytesIO(res.content), read_only=True)["ventes"]
+    # Mêmes lignes, en cellules typées (dates et nombres).
+    assert list(feuille.iter_rows(values_only=True)) == [
+        tuple(attendu[0]),
+        (ventes[1]["id"], datetime(2025, 3, 1, 10), produit["id"], "Export", 1, 2.5, admin_id),
+        (ventes[0]["id"], datetime(2025, 3, 2, 9, 30), produit["id"], "Export", 3, 7.5, admin_id),
+    ]
+
+def test_import_produits_erreurs_par_ligne_sans_doublons(client: TestClient, base_vide):
+    token = client.post("/api/token", data={"username": "admin", "password": "Dakar2026@"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    contenu = (
+        "nom,prix_achat,prix_vente,quantite\n"
+        "Import A,1,2,10\n"
+        "Import B,abc,2,5\n"
+        "\n"
+        "Import C,1,2,-1\n"
+        'Import D,"1,5",3,4\n'
+    ).encode()
+
+    def importer():
+        # Lots de 2 lignes : les erreurs sont rapportées quel que soit leur lot.
+        res = client.post("/api/produits/import", headers=headers, params={"taille_lot": 2},
+                          files={"fichier": ("catalogue.csv", contenu, "text/csv")})
+        assert res.status_code == 200, res.text
+        return res.json()
+
+    rapport = importer()
+    assert (rapport["lignes"], rapport["crees"], rapport["mis_a_jour"]) == (4, 2, 0)
+    assert [(e["ligne"], e["erreur"]) for e in rapport["erreurs"]] == [
+        (3, "Valeur invalide pour prix_achat : 'abc'."),
+        (5, "quantite ne peut pas être négatif."),
+    ]
+
+    # Réimport du même fichier : mise à jour par nom, aucun doublon.
+    rapport = importer()
+    assert (rapport["crees"], rapport["mis_a_jour"], len(rapport["erreurs"])) == (0, 2, 2)
+    with base_vide.get_db() as session:
+        produits = session.query(base_vide.Produit).filter(base_vide.Produit.nom.like("Import %")).order_by(base_vide.Produit.nom).all()
+        assert [(p.nom, p.prix_achat, p.quantite) for p in produits] == [("Import A", Decimal("1.00"), 10), ("Import D", Decimal("1.50"), 4)]
+
+    res = client.post("/api/produits/import", headers=headers, files={"fichier": ("catalogue.csv", b"nom,prix\nX,1\n", "text/csv")})
+    assert res.status_code == 400 and "prix_achat" in res.json()["detail"]
+
+def test_flux_sse_diffuse_une_vente(client: TestClient):
+    token = client.post("/api/token", data={"username": "admin", "password": "Dakar2026@"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    produit = client.post("/api/produits", headers=headers, json={"nom": "Flux", "prix_achat": 1, "prix_vente": 4, "quantite": 10}).json()
+
+    async def scenario():
+        # Appel ASGI direct : le flux ne se termine pas, il est lu au fil de l'eau.
+        evenements.diffuseur.demarrer(asyncio.get_running_loop())
+        recus, deconnexion = asyncio.Queue(), asyncio.Event()
+
+        async def receive():
+            await deconnexion.wait()
+            return {"type": "http.disconnect"}
+
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+            "path": "/api/events", "raw_path": b"/api/events", "query_string": f"token={token}".encode(),
+            "root_path": "", "headers": [(b"host", b"test")], "client": ("test", 1), "server": ("test", 80),
+        }
+        tache = asyncio.create_task(app(scope, receive, recus.put))
+        try:
+            debut = await asyncio.wait_for(recus.get(), 5)
+            assert debut["status"] == 200 and dict(debut["headers"])[b"content-type"].startswith(b"text/event-stream")
+            assert (await asyncio.wait_for(recus.get(), 5))["body"] == b"retry: 3000\n\n"
+
+            vente = await asyncio.to_thread(client.post, "/api/ventes", headers=headers, json={"produit_id": produit["id"], "quantite": 3})
+            assert vente.status_code == 200
+            messages = {}
+            while "ventes" not in messages:
+                corps = (await asyncio.wait_for(recus.get(), 5))["body"].decode()
+                evenement, donnees = corps.strip().split("\n")
+                messages[evenement.removeprefix("event: ")] = json.loads(donnees.removeprefix("data: "))
+            return messages
+        finally:
+            deconnexion.set()
+            await asyncio.wait_for(tache, 5)
+            evenements.diffuseur.arreter()
+
+    messages = asyncio.run(scenario())
+    assert messages["stock"] == {"produit_id": produit["id"], "nom": "Flux", "quantite": 7, "variation": -3, "prix_achat": 1.0}
+    assert messages["ventes"] == {"produit_id": produit["id"], "nom": "Flux", "quantite": 3, "ca": 12.0, "quantite_jour": 3}
+    assert evenements.diffuseur.stats()["clients"] == 0
+
+def test_fichiers_statiques_precompresses(tmp_path):
+    pytest.importorskip("brotli")
+    script = b"console.log('magasin');\n" * 200
+    (tmp_path / "static" / "js").mkdir(parents=True)
+    (tmp_path / "static" / "js" / "main.1a2b3c4d.js").write_bytes(script)
+    (tmp_path / "index.html").write_bytes(b"<!doctype html><title>Magasin</title>" + b" " * 2000)
+    statique.precompresser(tmp_path)
+    fichiers = TestClient(statique.StaticFilesPrecompresses(directory=tmp_path))
+
+    def obtenir(chemin, accept_encoding):
+        res = fichiers.get(chemin, headers={"Accept-Encoding": accept_encoding})
+        assert res.status_code == 200 and res.headers["vary"] == "Accept-Encoding"
+        return res
+
+    # Fichier avec hash : version brotli si acceptée, sinon gzip, sinon l'original ; toujours immuable.
+    for accept_encoding, encodage in (("gzip, deflate, br", "br"), ("gzip, br;q=0", "gzip"), ("identity", None)):
+        res = obtenir("/static/js/main.1a2b3c4d.js", accept_encoding)
+        assert res.headers.get("content-encoding") == encodage
+        assert res.headers["content-type"].startswith("text/javascript")
+        assert res.headers["cache-control"] == "public, max-age=31536000, immutable"
+        assert res.content == script
+    assert int(obtenir("/static/js/main.1a2b3c4d.js", "br").headers["content-length"]) < len(script) // 10
+
+    # index.html n'a pas de hash : revalidé à chaque chargement.
+    res = obtenir("/index.html", "br")
+    assert res.headers["content-encoding"] == "br" and res.headers["cache-control"] == "no-cache"
+
+def test_listes_orjson_conformes_aux_modeles_pydantic(client: TestClient, base_vide):
+    from pydantic import TypeAdapter
+    from backend import main
+    token = client.post("/api/token", data={"username": "admin", "password": "Dakar2026@"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    produit = client.post("/api/produits", headers=headers, json={"nom": "Forme", "prix_achat": "1.25", "prix_vente": "2.50", "quantite": 9}).json()
+    client.post("/api/ventes", headers=headers, json={"produit_id": produit["id"], "quantite": 2})
+    client.post("/api/pertes", headers=headers, json={"produit_id": produit["id"], "quantite": 1})
+    client.post("/api/frais", headers=headers, json={"produit_id": produit["id"], "description": "transport", "montant": "3.10"})
+
+    # Les listes encodées par orjson depuis des dictionnaires doivent être identiques
+    # à la sérialisation Pydantic (response_model) des mêmes lignes chargées en ORM.
+    listes = (
+        ("/api/produits", main.Produit, base_vide.Produit),
+        ("/api/ventes", main.Vente, base_vide.Vente),
+        ("/api/pertes", main.Perte, base_vide.Perte),
+        ("/api/frais", main.FraisAnnexe, base_vide.FraisAnnexe),
+    )
+    for url, schema, modele in listes:
+        res = client.get(url, headers=headers)
+        assert res.status_code == 200 and res.headers["content-type"] == "application/json"
+        items = res.json() if isinstance(res.json(), list) else res.json()["items"]
+        assert items, url
+        with base_vide.get_db() as session:
+            adaptateur = TypeAdapter(List[schema])
+            lignes = adaptateur.validate_python([session.get(modele, item["id"]) for item in items], from_attributes=True)
+            assert items == adaptateur.dump_python(lignes, mode="json"), url
+
+    vente = next(v for v in client.get("/api/ventes", headers=headers).json()["items"] if v["produit"]["id"] == produit["id"])
+    assert vente["prix_total"] == 5.0 and vente["produit"]["prix_achat"] == 1.25
+    assert datetime.fromisoformat(vente["date"]).date() == datetime.now(timezone.utc).date()
+    frais = next(f for f in client.get("/api/frais", headers=headers).json()["items"] if f["produit"]["id"] == produit["id"])
+    assert frais["montant"] == 3.1
+
+def test_rapports_pdf_soumission_suivi_et_cache(client: TestClient, monkeypatch):
+    from collections import OrderedDict
+    from concurrent.futures import ThreadPoolExecutor
+    from backend import rapports
+    token = client.post("/api/token", data={"username": "admin", "password": "Dakar2026@"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    # Rendu remplacé (pas de WeasyPrint) et exécuté dans un thread : le test
+    # décide du moment où il se termine.
+    liberer, rendus = threading.Event(), []
+    def rendre_pdf(analyse, start_date, end_date):
+        rendus.append((start_date, end_date))
+        liberer.wait(10)
+        if start_date == "2025-02-01":
+            raise RuntimeError("rendu impossible")
+        return f"%PDF-{start_date}".encode()
+    pool = ThreadPoolExecutor(max_workers=2)
+    monkeypatch.setattr(rapports, "rendre_pdf", rendre_pdf)
+    monkeypatch.setattr(rapports, "_pool", pool)
+    monkeypatch.setattr(rapports, "_taches", OrderedDict())
+    monkeypatch.setattr(rapports, "_pdfs", OrderedDict())
+    monkeypatch.setattr(rapports, "_futures", {})
+    monkeypatch.setattr(rapports, "REPORT_MAX_PENDING", 2)
+
+    def soumettre(debut, fin):
+        return client.post("/api/rapports", headers=headers, json={"start_date": debut, "end_date": fin})
+
+    def attendre(tache_id):
+        for _ in range(200):
+            tache = client.get(f"/api/rapports/{tache_id}", headers=headers).json()
+            if tache["statut"] in ("termine", "erreur"):
+                return tache
+            time.sleep(0.01)
+        raise AssertionError("rendu non terminé")
+
+    try:
+        res = soumettre("2025-01-01", "2025-01-31")
+        assert res.status_code == 202 and res.json()["statut"] == "en_attente"
+        tache = res.json()
+        assert client.get(f"/api/rapports/{tache['id']}/pdf", headers=headers).status_code == 409
+        # Même période, mêmes données : la tâche partage le rendu en cours.
+        partagee = soumettre("2025-01-01", "2025-01-31").json()
+        assert partagee["id"] != tache["id"]
+        echec = soumettre("2025-02-01", "2025-02-28").json()
+        # File pleine (REPORT_MAX_PENDING rendus distincts en attente) : 503.
+        res = soumettre("2025-03-01", "2025-03-31")
+        assert res.status_code == 503
+
+        liberer.set()
+        assert attendre(tache["id"])["statut"] == "termine"
+        assert attendre(partagee["id"])["statut"] == "termine"
+        assert attendre(echec["id"]) == {**echec, "statut": "erreur", "erreur": "rendu impossible"}
+        assert client.get(f"/api/rapports/{echec['id']}/pdf", headers=headers).status_code == 409
+
+        res = client.get(f"/api/rapports/{tache['id']}/pdf", headers=headers)
+        assert res.status_code == 200 and res.headers["content-type"] == "application/pdf"
+        assert res.content == b"%PDF-2025-01-01"
+        assert 'filename="rapport_2025-01-01_2025-01-31.pdf"' in res.headers["content-disposition"]
+
+        # Période et données inchangées : le PDF en cache sert, sans nouveau rendu.
+        res = soumettre("2025-01-01", "2025-01-31")
+        assert res.status_code == 202 and res.json()["statut"] == "termine"
+        assert rendus == [("2025-01-01", "2025-01-31"), ("2025-02-01", "2025-02-28")]
+        assert client.get("/api/rapports/inconnu", headers=headers).status_code == 404
+        assert client.get("/api/rapports/inconnu/pdf", headers=headers).status_code == 404
+    finally:
+        liberer.set()
+        pool.shutdown(wait=True)
+
+def test_pagination_par_cle_dates_egales_et_filtres(client: TestClient):
+    token = client.post("/api/token", data={"username": "admin", "password": "Dakar2026@"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    a = client.post("/api/produits", headers=headers, json={"nom": "Page A", "prix_achat": 1, "prix_vente": 2, "quantite": 100}).json()
+    b = client.post("/api/produits", headers=headers, json={"nom": "Page B", "prix_achat": 1, "prix_vente": 2, "quantite": 100}).json()
+    client.post("/api/users", headers=headers, json={"username": "pagineur", "email": "pagineur@example.com", "password": "Abcdefgh1@", "roles": ["manager"]})
+    autre = {"Authorization": "Bearer " + client.post("/api/token", data={"username": "pagineur", "password": "Abcdefgh1@"}).json()["access_token"]}
+
+    # Plusieurs ventes à la même date : seul l'id les départage.
+    midi, veille = "2024-06-10T12:00:00+00:00", "2024-06-09T08:00:00+00:00"
+    lots = []
+    for entetes, id_lot, lignes in (
+        (headers, "page-1", [(a, midi)] * 4 + [(b, midi)] * 2 + [(a, veille)] * 2),
+        (autre, "page-2", [(a, midi)] * 3 + [(b, veille)]),
+    ):
+        res = client.post("/api/ventes/batch", headers=entetes, json={
+            "id_lot": id_lot, "lignes": [{"produit_id": p["id"], "quantite": 1, "date": d} for p, d in lignes]
+        })
+        assert res.status_code == 200, res.text
+        lots.append(res.json())
+
+    def parcourir(**params):
+        items, pages, curseur = [], 0, None
+        while True:
+            res = client.get("/api/ventes", headers=headers, params={"limit": 2, **params, **({"cursor": curseur} if curseur else {})})
+            assert res.status_code == 200, res.text
+            page = res.json()
+            items += page["items"]
+            pages += 1
+            curseur = page["next_cursor"]
+            if curseur is None:
+                return items, pages
+            assert pages < 20, "le curseur n'avance pas"
+
+    periode = {"start_date": "2024-06-09", "end_date": "2024-06-10"}
+    items, pages = parcourir(**periode)
+    cles = [(v["date"], v["id"]) for v in items]
+    # Ni doublon ni trou : chaque vente une fois, dans l'ordre (date, id) décroissant.
+    assert len(cles) == len(set(cles)) == 12 and pages == 6
+    assert cles == sorted(cles, reverse=True)
+
+    # Filtres combinés, conservés d'une page à l'autre avec le curseur.
+    with database.get_db() as session:
+        id_autre = session.query(database.User.id).filter_by(username="pagineur").scalar()
+    items, _ = parcourir(**periode, produit_id=a["id"], user_id=id_autre)
+    assert sorted(v["id"] for v in items) == [v["id"] for v in lots[1] if v["produit_id"] == a["id"]]
+    items, _ = parcourir(produit_id=a["id"], start_date="2024-06-09", end_date="2024-06-09")
+    assert len(items) == 2 and all(v["date"].startswith("2024-06-09") for v in items)
+
+    for curseur in ("pas-un-curseur", base64.urlsafe_b64encode(b"2024-06-10T12:00:00").decode()):
+        res = client.get("/api/ventes", headers=headers, params={"cursor": curseur})
+        assert res.status_code == 400 and res.json()["detail"] == "Curseur de pagination invalide."
+
+def test_kpis_du_tableau_de_bord_en_une_passe(client: TestClient, base_vide, monkeypatch):
+    from sqlalchemy import func
+    token = client.post("/api/token", data={"username": "admin", "password": "Dakar2026@"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    produits = [
+        client.post("/api/produits", headers=headers, json={"nom": f"Tableau {i}", "prix_achat": "1.10", "prix_vente": f"{i + 2}.25", "quantite": 100}).json()
+        for i in range(7)
+    ]
+    hier = (datetime.now(timezone.utc) - timedelta(days=1)).isoformat()
+    lignes = [{"produit_id": p["id"], "quantite": 10 * (i + 1)} for i, p in enumerate(produits)]
+    lignes += [{"produit_id": produits[0]["id"], "quantite": 9, "date": hier}]
+    assert client.post("/api/ventes/batch", headers=headers, json={"id_lot": "tableau", "lignes": lignes}).status_code == 200
+
+    # Fuseau local choisi pour que le jour local diffère du jour UTC : le jour du
+    # tableau de bord reste celui des dates enregistrées (UTC), comme pour le
+    # flux d'événements.
+    fuseau = "Etc/GMT+12" if datetime.now(timezone.utc).hour < 12 else "Etc/GMT-14"
+    try:
+        with monkeypatch.context() as m, base_vide.get_db() as session:
+            m.setenv("TZ", fuseau)
+            time.tzset()
+            kpis = base_vide.get_dashboard_kpis(session)
+            # Requêtes d'avant la réécriture, une par indicateur, sur le jour UTC.
+            V, P = base_vide.Vente, base_vide.Produit
+            jour = func.date(V.date) == datetime.now(timezone.utc).date().isoformat()
+            attendu = {
+                "ca_today": session.query(func.sum(V.prix_total)).filter(jour).scalar() or 0,
+                "ventes_today": session.query(func.sum(V.quantite)).filter(jour).scalar() or 0,
+                "total_stock_quantite": session.query(func.sum(P.quantite)).scalar() or 0,
+                "total_stock_valeur": sum(p.quantite * p.prix_achat for p in session.query(P)),
+                "top_ventes_today": [dict(r._mapping) for r in session.query(P.nom, func.sum(V.quantite).label("quantite_vendue")).join(V).filter(jour).group_by(P.nom).order_by(func.sum(V.quantite).desc()).limit(5)],
+                "low_stock_produits": session.query(P).filter(P.quantite < 10).order_by(P.quantite).limit(5).all(),
+            }
+    finally:
+        time.tzset()
+    assert kpis == attendu
+    assert kpis["top_ventes_today"][0] == {"nom": "Tableau 6", "quantite_vendue": 70}
+
+def test_cache_des_resultats_invalidation_ciblee(client: TestClient):
+    token = client.post("/api/token", data={"username": "admin", "password": "Dakar2026@"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    produit = client.post("/api/produits", headers=headers, json={"nom": "Cache", "prix_achat": 1, "prix_vente": 3, "quantite": 50}).json()
+    aujourdhui = datetime.now(timezone.utc).date()
+    periodes = {
+        "jour": (aujourdhui, aujourdhui),
+        "mois": (aujourdhui - timedelta(days=30), aujourdhui),
+        "passe": (date(2024, 3, 1), date(2024, 3, 31)),
+        "ancien": (date(2023, 1, 1), date(2023, 1, 31)),
+    }
+
+    def dashboard():
+        return client.get("/api/dashboard", headers=headers).json()
+
+    def analyse(nom):
+        debut, fin = periodes[nom]
+        res = client.get("/api/analyse", headers=headers, params={"start_date": debut.isoformat(), "end_date": fin.isoformat()})
+        assert res.status_code == 200, res.text
+        return res.json()
+
+    def cles():
+        return set(cache.resultats._entrees)
+
+    cache.resultats.invalider()
+    stats = cache.resultats.stats()
+    avant = {"dashboard": dashboard(), **{nom: analyse(nom) for nom in periodes}}
+    assert cache.resultats.stats()["misses"] == stats["misses"] + 5
+    dashboard(), analyse("passe")
+    assert cache.resultats.stats()["hits"] == stats["hits"] + 2
+    tout = cles()
+    assert len(tout) == 5
+
+    # Une vente du jour invalide le tableau de bord et les analyses qui contiennent
+    # aujourd'hui ; les analyses de périodes passées restent en cache.
+    client.post("/api/ventes", headers=headers, json={"produit_id": produit["id"], "quantite": 2})
+    assert cles() == {("analyse", *periodes["passe"]), ("analyse", *periodes["ancien"])}
+    stats = cache.resultats.stats()
+    assert dashboard()["ca_today"] == avant["dashboard"]["ca_today"] + 6
+    assert analyse("jour")["chiffre_affaires"] == avant["jour"]["chiffre_affaires"] + 6
+    assert analyse("passe") == avant["passe"]
+    assert cache.resultats.stats()["hits"] == stats["hits"] + 1
+    assert cache.resultats.stats()["misses"] == stats["misses"] + 2
+
+    # Une vente hors ligne datée dans le passé n'invalide que la période qui la contient.
+    client.post("/api/ventes/batch", headers=headers, json={
+        "id_lot": "cache-1", "lignes": [{"produit_id": produit["id"], "quantite": 1, "date": "2024-03-15T10:00:00+00:00"}]
+    })
+    assert ("analyse", *periodes["passe"]) not in cles()
+    assert ("analyse", *periodes["ancien"]) in cles() and ("analyse", *periodes["jour"]) in cles()
+    assert analyse("passe")["chiffre_affaires"] == avant["passe"]["chiffre_affaires"] + 3
+
+def test_cache_des_utilisateurs_invalide_par_les_ecritures(client: TestClient):
+    token = client.post("/api/token", data={"username": "admin", "password": "Dakar2026@"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    compte = {"email": "principal@example.com", "password": "Abcdefgh1@"}
+    user = client.post("/api/users", headers=headers, json={**compte, "username": "principal", "roles": ["admin"]}).json()
+
+    def connexion(username):
+        return {"Authorization": "Bearer " + client.post("/api/token", data={"username": username, "password": compte["password"]}).json()["access_token"]}
+
+    # Chaque requête suivante réutilise le principal en cache : une écriture sur
+    # l'utilisateur doit s'y voir dès la requête d'après, avec le même token.
+    siens = connexion("principal")
+    assert client.get("/api/users", headers=siens).status_code == 200
+    assert "principal" in cache.principals._entrees
+    client.put(f"/api/users/{user['id']}", headers=headers, json={"username": "principal", "email": compte["email"], "roles": ["manager"]})
+    assert client.get("/api/users", headers=siens).status_code == 403
+    assert [r["name"] for r in client.get("/api/users/me", headers=siens).json()["roles"]] == ["manager"]
+
+    # Renommé : l'ancien nom du token ne désigne plus personne.
+    client.put(f"/api/users/{user['id']}", headers=headers, json={"username": "principal2", "email": compte["email"], "roles": ["manager"]})
+    assert client.get("/api/users/me", headers=siens).status_code == 401
+    siens = connexion("principal2")
+    assert client.get("/api/users/me", headers=siens).status_code == 200
+
+    client.delete(f"/api/users/{user['id']}", headers=headers)
+    assert client.get("/api/users/me", headers=siens).status_code == 401
+
+def test_analyse_financiere_egale_aux_tables_brutes(client: TestClient, base_vide):
+    token = client.post("/api/token", data={"username": "admin", "password": "Dakar2026@"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    a, b, c = (
+        client.post("/api/produits", headers=headers, json={"nom": f"Analyse {nom}", "prix_achat": achat, "prix_vente": vente, "quantite": 100}).json()
+        for nom, achat, vente in (("A", "1.20", "2.50"), ("B", "0.75", "1.99"), ("C", "4", "6.35"))
+    )
+    lignes = [
+        {"produit_id": a["id"], "quantite": 3, "date": "2023-05-31T23:59:00+00:00"},  # hors période
+        {"produit_id": a["id"], "quantite": 4, "date": "2023-06-01T00:00:00+00:00"},
+        {"produit_id": b["id"], "quantite": 7, "date": "2023-06-05T13:00:00+00:00"},
+        {"produit_id": c["id"], "quantite": 2, "date": "2023-06-05T18:30:00+00:00"},
+    ]
+    ventes = client.post("/api/ventes/batch", headers=headers, json={"id_lot": "analyse", "lignes": lignes}).json()
+    client.put(f"/api/ventes/{ventes[2]['id']}", headers=headers, json={"produit_id": a["id"], "quantite": 5})
+    client.delete(f"/api/ventes/{ventes[3]['id']}", headers=headers)
+    for produit, quantite in ((b, 6), (c, 1), (a, 2)):
+        client.post("/api/ventes", headers=headers, json={"produit_id": produit["id"], "quantite": quantite})
+    pertes = [client.post("/api/pertes", headers=headers, json={"produit_id": p["id"], "quantite": q}).json() for p, q in ((a, 3), (b, 1), (c, 2))]
+    client.put(f"/api/pertes/{pertes[0]['id']}", headers=headers, json={"produit_id": b["id"], "quantite": 4})
+    client.delete(f"/api/pertes/{pertes[2]['id']}", headers=headers)
+    client.post("/api/frais", headers=headers, json={"produit_id": c["id"], "description": "transport", "montant": "12.40"})
+    client.put(f"/api/produits/{c['id']}", headers=headers, json={**c, "prix_achat": "4.10", "quantite": 97})
+
+    debut, fin = date(2023, 6, 1), datetime.now(timezone.utc).date()
+    with base_vide.get_db() as session:
+        analyse = base_vide.get_analyse_financiere(session, f"{debut}T00:00:00", f"{fin}T23:59:59")
+        # Mêmes chiffres recalculés ligne à ligne depuis les tables brutes.
+        V, P, F, Pe = base_vide.Vente, base_vide.Produit, base_vide.FraisAnnexe, base_vide.Perte
+        dans_periode = lambda ligne: debut <= ligne.date.date() <= fin
+        ventes = [(v, p) for v, p in session.query(V, P).join(P, V.produit_id == P.id) if dans_periode(v)]
+        profits, pertes, jours = {}, {}, {}
+        for v, p in ventes:
+            profits[p.nom] = profits.get(p.nom, 0) + v.prix_total - p.prix_achat * v.quantite
+            jours[v.date.date().isoformat()] = jours.get(v.date.date().isoformat(), 0) + v.prix_total
+        for perte, p in session.query(Pe, P).join(P, Pe.produit_id == P.id):
+            if dans_periode(perte):
+                pertes[p.nom] = pertes.get(p.nom, 0) + perte.quantite
+        ca = sum(v.prix_total for v, _ in ventes)
+        cogs = sum(p.prix_achat * v.quantite for v, p in ventes)
+        depenses = sum(f.montant for f in session.query(F) if dans_periode(f))
+
+    assert (analyse["chiffre_affaires"], analyse["cogs"], analyse["depenses"]) == (ca, cogs, depenses)
+    assert (analyse["benefice"], analyse["benefice_net"]) == (ca - cogs, ca - cogs - depenses)
+    assert analyse["graph_data"] == [{"jour": jour, "ca_jour": jours[jour]} for jour in sorted(jours)]
+    assert "2023-05-31" not in jours and jours["2023-06-05"] == Decimal("12.50")
+    # Les ex aequo peuvent être départagés dans n'importe quel ordre : seules les
+    # valeurs du top 5 sont comparées dans l'ordre.
+    for cle, valeur, attendus in (("top_profitable_products", "total_profit", profits), ("top_lost_products", "total_lost", pertes)):
+        top = analyse[cle]
+        assert [ligne[valeur] for ligne in top] == sorted(attendus.values(), reverse=True)[:5]
+        assert all(attendus[ligne["nom"]] == ligne[valeur] for ligne in top)
+
+def test_metriques_protegees_et_au_format_prometheus(client: TestClient, monkeypatch, caplog):
+    import re
+    from backend import metrics
+    token = client.post("/api/token", data={"username": "admin", "password": "Dakar2026@"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    # Sans jeton configuré, /metrics n'est pas servi ; sinon, il exige ce jeton.
+    monkeypatch.setattr(metrics, "METRICS_TOKEN", "")
+    assert client.get("/metrics").status_code == 404
+    monkeypatch.setattr(metrics, "METRICS_TOKEN", "jeton-metriques")
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers=headers).status_code == 401
+
+    echantillon = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{[a-zA-Z_]\w*="(?:[^"\\]|\\.)*"(?:,[a-zA-Z_]\w*="(?:[^"\\]|\\.)*")*\})? (\S+)$')
+    def metriques():
+        res = client.get("/metrics", headers={"Authorization": "Bearer jeton-metriques"})
+        assert res.status_code == 200 and res.headers["content-type"].startswith("text/plain")
+        valeurs, types = {}, {}
+        for ligne in res.text.splitlines():
+            if ligne.startswith("# TYPE "):
+                _, _, nom, genre = ligne.split()
+                types[nom] = genre
+            elif not ligne.startswith("# HELP "):
+                trouve = echantillon.match(ligne)
+                assert trouve, ligne
+                nom = trouve.group(1)
+                famille = nom if nom in types else re.sub(r"_(bucket|sum|count)$", "", nom)
+                # Chaque série suit la déclaration de sa famille (TYPE).
+                assert types.get(famille) == ("histogram" if famille != nom else types.get(nom)), ligne
+                valeurs[nom + (trouve.group(2) or "")] = float(trouve.group(3))
+        assert types["magasin_http_request_duration_seconds"] == "histogram"
+        assert types["magasin_http_requests_total"] == "counter"
+        assert types["magasin_cache_resultats_hits"] == "gauge"
+        return valeurs
+
+    # Histogramme par modèle de route (pas par chemin reçu) : buckets cumulatifs,
+    # le dernier (+Inf) égal au nombre de requêtes.
+    avant = metriques()
+    produit = client.post("/api/produits", headers=headers, json={"nom": "Mesure", "prix_achat": 1, "prix_vente": 2, "quantite": 5}).json()
+    vente = client.post("/api/ventes", headers=headers, json={"produit_id": produit["id"], "quantite": 1}).json()
+    client.get("/api/ventes", headers=headers)
+    client.get("/api/ventes", headers=headers)
+    client.delete(f"/api/ventes/{vente['id']}", headers=headers)
+    apres = metriques()
+    for methode, route, n in (("GET", "/api/ventes", 2), ("DELETE", "/api/ventes/{vente_id}", 1)):
+        etiquettes = f'method="{methode}",route="{route}"'
+        buckets = [apres[f'magasin_http_request_duration_seconds_bucket{{{etiquettes},le="{le}"}}']
+                   for le in (*map(metrics._nombre, metrics.BORNES_DUREE), "+Inf")]
+        assert buckets == sorted(buckets)
+        compte = f"magasin_http_request_duration_seconds_count{{{etiquettes}}}"
+        assert buckets[-1] == apres[compte] == avant.get(compte, 0) + n
+    assert not any(f"/api/ventes/{vente['id']}" in nom for nom in apres)
+
+    # Seuil des requêtes lentes : au-delà de SLOW_QUERY_MS, chaque requête SQL
+    # est journalisée et comptée ; 0 désactive.
+    def lentes(seuil):
+        monkeypatch.setattr(metrics, "SLOW_QUERY_MS", seuil)
+        caplog.clear()
+        compte = metriques().get("magasin_db_slow_queries_total", 0)
+        with caplog.at_level("WARNING", logger=metrics.logger.name):
+            res = client.get("/api/ventes", headers=headers)
+        journal = [r for r in caplog.records if r.getMessage().startswith("Requête SQL lente")]
+        assert len(journal) == metriques().get("magasin_db_slow_queries_total", 0) - compte
+        return len(journal), int(res.headers["x-db-queries"])
+
+    journalisees, executees = lentes(1e-6)
+    assert journalisees == executees > 0
+    assert lentes(60_000) == (0, executees)
+    assert lentes(0) == (0, executees)
+
+def test_lecture_de_ses_ecritures_puis_replique(client: TestClient, monkeypatch):
+    from collections import OrderedDict
+    from sqlalchemy.orm import sessionmaker
+    token = client.post("/api/token", data={"username": "admin", "password": "Dakar2026@"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    produit = client.post("/api/produits", headers=headers, json={"nom": "Réplique", "prix_achat": 1, "prix_vente": 2, "quantite": 50}).json()
+    client.post("/api/users", headers=headers, json={"username": "ecrivain", "email": "ecrivain@example.com", "password": "Abcdefgh1@", "roles": []})
+    entetes_ecrivain = {"Authorization": "Bearer " + client.post("/api/token", data={"username": "ecrivain", "password": "Abcdefgh1@"}).json()["access_token"]}
+
+    # Réplique : la même base, ouverte en lecture seule par un second moteur.
+    # /api/produits n'envoie d'ETag que s'il est lu sur la base principale.
+    lecture = database.creer_engine(database.engine.url.render_as_string(hide_password=False), lecture_seule=True)
+    monkeypatch.setattr(replique, "read_engine", lecture)
+    monkeypatch.setattr(replique, "ReadSessionLocal", sessionmaker(autocommit=False, autoflush=False, bind=lecture))
+    monkeypatch.setattr(replique, "_copie_sqlite", lambda: False)
+    monkeypatch.setattr(replique, "_dernieres_ecritures", OrderedDict())
+    monkeypatch.setattr(replique, "READ_STICKY_SECONDS", 0.5)
+
+    navigateur = TestClient(app)  # garde ses cookies, comme un navigateur
+    def sur_primaire(client_http=navigateur):
+        res = client_http.get("/api/produits", headers=headers)
+        assert res.status_code == 200
+        return "etag" in res.headers
+
+    try:
+        assert not sur_primaire()
+        # Juste après une écriture : la base principale, y compris sur un autre
+        # worker, qui ne la connaît que par le cookie de la réponse.
+        res = navigateur.post("/api/ventes", headers=headers, json={"produit_id": produit["id"], "quantite": 1})
+        assert res.cookies.get(replique.COOKIE_ECRITURE)
+        assert "Max-Age=1;" in res.headers["set-cookie"] and "HttpOnly" in res.headers["set-cookie"]
+        assert sur_primaire()
+        replique._dernieres_ecritures.clear()
+        assert sur_primaire()
+        assert not sur_primaire(TestClient(app))
+
+        # Après le délai : la réplique. L'entrée périmée est retirée à l'écriture
+        # suivante, même d'un autre utilisateur.
+        navigateur.post("/api/ventes", headers=headers, json={"produit_id": produit["id"], "quantite": 1})
+        assert list(replique._dernieres_ecritures) == ["admin"]
+        time.sleep(0.6)
+        assert not sur_primaire()
+        client.post("/api/ventes", headers=entetes_ecrivain, json={"produit_id": produit["id"], "quantite": 1})
+        assert list(replique._dernieres_ecritures) == ["ecrivain"]
+    finally:
+        lecture.dispose()
@@ -1,18 +1,60 @@
 import React, { useState, useEffect } from 'react';
 import axios from 'axios';
+import useEvenements from '../useEvenements';
+
+const SEUIL_STOCK_FAIBLE = 10;
+
+// Top 5 des ventes du jour, après mise à jour du total vendu d'un produit.
+const majTopVentes = (top, { nom, quantite_jour }) =>
+    [...top.filter(item => item.nom !== nom), { nom, quantite_vendue: quantite_jour }]
+        .filter(item => item.quantite_vendue > 0)
+        .sort((a, b) => b.quantite_vendue - a.quantite_vendue)
+        .slice(0, 5);
+
+// Produits en stock faible, après le nouveau stock d'un produit.
+const majStockFaible = (faibles, { produit_id, nom, quantite }) =>
+    [...faibles.filter(p => p.id !== produit_id), ...(quantite < SEUIL_STOCK_FAIBLE ? [{ id: produit_id, nom, quantite }] : [])]
+        .sort((a, b) => a.quantite - b.quantite)
+        .slice(0, 5);
 
 const Dashboard = () => {
     const [data, setData] = useState(null);
 
+    const fetchData = async () => {
+        const token = localStorage.getItem('token');
+        const response = await axios.get('/api/dashboard', { headers: { Authorization: `Bearer ${token}` } });
+        setData(response.data);
+    };
+
     useEffect(() => {
-        const fetchData = async () => {
-            const token = localStorage.getItem('token');
-            const response = await axios.get('/api/dashboard', { headers: { Authorization: `Bearer ${token}` } });
-            setData(response.data);
-        };
         fetchData();
     }, []);
 
+    // Les ventes et mouvements de stock arrivent en différentiel ; un changement
+    // de produit (prix, création, import) recharge le tableau de bord.
+    useEvenements({
+        ventes: evt => setData(prev => prev && {
+            ...prev,
+            ca_today: prev.ca_today + evt.ca,
+            ventes_today: prev.ventes_today + evt.quantite,
+            top_ventes_today: majTopVentes(prev.top_ventes_today, evt),
+        }),
+        stock: evt => {
+            if (data && evt.quantite >= SEUIL_STOCK_FAIBLE && data.low_stock_produits.some(p => p.id === evt.produit_id)) {
+                // Un autre produit, inconnu ici, peut entrer dans la liste : rechargement.
+                fetchData();
+                return;
+            }
+            setData(prev => prev && {
+                ...prev,
+                total_stock_quantite: prev.total_stock_quantite + evt.variation,
+                total_stock_valeur: prev.total_stock_valeur + evt.variation * evt.prix_achat,
+                low_stock_produits: majStockFaible(prev.low_stock_produits, evt),
+            });
+        },
+        produit: () => fetchData(),
+    }, fetchData);
+
     if (!data) {
         return <div>Chargement...</div>;
     }
@@ -5,6 +5,7 @@ import { toast } from 'react-toastify';
 
 const Frais = () => {
     const [frais, setFrais] = useState([]);
+    const [nextCursor, setNextCursor] = useState(null);
     const [produits, setProduits] = useState([]);
     const [showModal, setShowModal] = useState(false);
     const [currentFrais, setCurrentFrais] = useState(null);
@@ -14,11 +15,13 @@ const Frais = () => {
         fetchProduits();
     }, []);
 
-    const fetchFrais = async () => {
+    // Sans curseur, recharge la première page ; avec curseur, ajoute la page suivante.
+    const fetchFrais = async (cursor = null) => {
         try {
             const token = localStorage.getItem('token');
-            const response = await axios.get('/api/frais', { headers: { Authorization: `Bearer ${token}` } });
-            setFrais(response.data);
+            const response = await axios.get('/api/frais', { headers: { Authorization: `Bearer ${token}` }, params: cursor ? { cursor } : {} });
+            setFrais(prev => cursor ? [...prev, ...response.data.items] : response.data.items);
+            setNextCursor(response.data.next_cursor);
         } catch (error) {
             toast.error("Erreur lors de la récupération des frais.");
         }
@@ -113,6 +116,11 @@ const Frais = () => {
                     ))}
                 </tbody>
             </table>
+            {nextCursor && (
+                <div className="text-center mb-3">
+                    <Button variant="outline-secondary" onClick={() => fetchFrais(nextCursor)}>Charger plus</Button>
+                </div>
+            )}
 
             <Modal show={showModal} onHide={handleClose}>
                 <Modal.Header closeButton>
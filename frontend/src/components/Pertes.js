@@ -5,6 +5,7 @@ import { toast } from 'react-toastify';
 
 const Pertes = () => {
     const [pertes, setPertes] = useState([]);
+    const [nextCursor, setNextCursor] = useState(null);
     const [produits, setProduits] = useState([]);
     const [showModal, setShowModal] = useState(false);
     const [currentPerte, setCurrentPerte] = useState(null);
@@ -14,11 +15,13 @@ const Pertes = () => {
         fetchProduits();
     }, []);
 
-    const fetchPertes = async () => {
+    // Sans curseur, recharge la première page ; avec curseur, ajoute la page suivante.
+    const fetchPertes = async (cursor = null) => {
         try {
             const token = localStorage.getItem('token');
-            const response = await axios.get('/api/pertes', { headers: { Authorization: `Bearer ${token}` } });
-            setPertes(response.data);
+            const response = await axios.get('/api/pertes', { headers: { Authorization: `Bearer ${token}` }, params: cursor ? { cursor } : {} });
+            setPertes(prev => cursor ? [...prev, ...response.data.items] : response.data.items);
+            setNextCursor(response.data.next_cursor);
         } catch (error) {
             toast.error("Erreur lors de la récupération des pertes.");
         }
@@ -111,6 +114,11 @@ const Pertes = () => {
                     ))}
                 </tbody>
             </table>
+            {nextCursor && (
+                <div className="text-center mb-3">
+                    <Button variant="outline-secondary" onClick={() => fetchPertes(nextCursor)}>Charger plus</Button>
+                </div>
+            )}
 
             <Modal show={showModal} onHide={handleClose}>
                 <Modal.Header closeButton>
@@ -2,6 +2,7 @@ import React, { useState, useEffect } from 'react';
 import axios from 'axios';
 import { Modal, Button, Form } from 'react-bootstrap';
 import { toast } from 'react-toastify';
+import useEvenements from '../useEvenements';
 
 const Stock = () => {
     const [produits, setProduits] = useState([]);
@@ -22,6 +23,22 @@ const Stock = () => {
         }
     };
 
+    // Les autres caisses et écrans font bouger le stock : la liste suit le flux d'événements.
+    useEvenements({
+        stock: evt => setProduits(prev => prev.map(p => (p.id === evt.produit_id ? { ...p, quantite: evt.quantite } : p))),
+        produit: evt => {
+            if (evt.action === 'cree') {
+                setProduits(prev => [...prev.filter(p => p.id !== evt.produit.id), evt.produit]);
+            } else if (evt.action === 'modifie') {
+                setProduits(prev => prev.map(p => (p.id === evt.produit.id ? evt.produit : p)));
+            } else if (evt.action === 'supprime') {
+                setProduits(prev => prev.filter(p => p.id !== evt.produit_id));
+            } else {
+                fetchProduits();
+            }
+        },
+    }, () => fetchProduits());
+
     const handleClose = () => {
         setShowModal(false);
         setCurrentProduit(null);
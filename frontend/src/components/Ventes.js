@@ -5,6 +5,7 @@ import { toast } from 'react-toastify';
 
 const Ventes = () => {
     const [ventes, setVentes] = useState([]);
+    const [nextCursor, setNextCursor] = useState(null);
     const [produits, setProduits] = useState([]);
     const [showModal, setShowModal] = useState(false);
     const [currentVente, setCurrentVente] = useState(null);
@@ -14,11 +15,13 @@ const Ventes = () => {
         fetchProduits();
     }, []);
 
-    const fetchVentes = async () => {
+    // Sans curseur, recharge la première page ; avec curseur, ajoute la page suivante.
+    const fetchVentes = async (cursor = null) => {
         try {
             const token = localStorage.getItem('token');
-            const response = await axios.get('/api/ventes', { headers: { Authorization: `Bearer ${token}` } });
-            setVentes(response.data);
+            const response = await axios.get('/api/ventes', { headers: { Authorization: `Bearer ${token}` }, params: cursor ? { cursor } : {} });
+            setVentes(prev => cursor ? [...prev, ...response.data.items] : response.data.items);
+            setNextCursor(response.data.next_cursor);
         } catch (error) {
             toast.error("Erreur lors de la récupération des ventes.");
         }
@@ -113,6 +116,11 @@ const Ventes = () => {
                     ))}
                 </tbody>
             </table>
+            {nextCursor && (
+                <div className="text-center mb-3">
+                    <Button variant="outline-secondary" onClick={() => fetchVentes(nextCursor)}>Charger plus</Button>
+                </div>
+            )}
 
             <Modal show={showModal} onHide={handleClose}>
                 <Modal.Header closeButton>
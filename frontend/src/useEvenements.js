@@ -0,0 +1,31 @@
+import { useEffect, useRef } from 'react';
+
+// Abonnement au flux /api/events (Server-Sent Events).
+// `handlers` associe un type d'événement ('stock', 'ventes', 'produit') à sa
+// fonction. `onReconnect` est appelé à chaque reconnexion : des événements ont
+// pu être manqués pendant la coupure, l'écran recharge alors son état complet.
+const useEvenements = (handlers, onReconnect) => {
+    const handlersRef = useRef(handlers);
+    const reconnectRef = useRef(onReconnect);
+    handlersRef.current = handlers;
+    reconnectRef.current = onReconnect;
+
+    useEffect(() => {
+        const token = localStorage.getItem('token');
+        // EventSource n'envoie pas d'en-tête Authorization : le token passe dans l'URL.
+        const source = new EventSource(`/api/events?token=${encodeURIComponent(token)}`);
+        let premiereConnexion = true;
+        source.onopen = () => {
+            if (!premiereConnexion && reconnectRef.current) {
+                reconnectRef.current();
+            }
+            premiereConnexion = false;
+        };
+        Object.keys(handlersRef.current).forEach(type => {
+            source.addEventListener(type, e => handlersRef.current[type](JSON.parse(e.data)));
+        });
+        return () => source.close();
+    }, []);
+};
+
+export default useEvenements;